@@ -103,6 +103,10 @@ exports.addHearing = [
             apiResponse.status,
             apiResponse.statusText
           );
+        } else {
+          // Ingestion runs in the background; the job can be polled at status_url
+          const job = await apiResponse.json();
+          console.log("Hearing ingestion queued:", job.job_id);
         }
       } catch (apiError) {
         console.error("Error calling external API:", apiError.message);
@@ -108,3 +108,115 @@ exports.communicateWithRag = async (req, res) => {
     });
   }
 };
+
+// Stream the RAG answer back to the client as server-sent events
+exports.communicateWithRagStream = async (req, res) => {
+  const lawyerId = req.user.id; // From JWT token middleware
+  const { question, case_number } = req.body;
+
+  if (!question) {
+    return res.status(400).json({
+      message: "Question is required",
+    });
+  }
+
+  if (!case_number) {
+    return res.status(400).json({
+      message: "Case number is required",
+    });
+  }
+
+  // Abort the upstream request if the client goes away mid-stream
+  const controller = new AbortController();
+  res.on("close", () => {
+    if (!res.writableEnded) {
+      controller.abort();
+    }
+  });
+
+  try {
+    // Verify that the case belongs to this lawyer
+    const caseCheckQuery = `
+      SELECT * FROM cases 
+      WHERE case_number = ? AND lawyer_id = ?
+    `;
+    const [caseExists] = await db.query(caseCheckQuery, [
+      case_number,
+      lawyerId,
+    ]);
+
+    if (caseExists.length === 0) {
+      return res.status(404).json({
+        message: "Case not found or does not belong to this lawyer",
+      });
+    }
+
+    const externalResponse = await fetch(
+      "http://localhost:5000/nyayasetu/rag/chat/stream",
+      {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Accept: "text/event-stream",
+          Authorization: `Bearer ${
+            req.headers.authorization?.split(" ")[1] || ""
+          }`,
+          "X-Case-Number": case_number.toString(),
+          "X-Lawyer-ID": lawyerId.toString(),
+          "X-Source": "law-firm-backend",
+        },
+        body: JSON.stringify({
+          question: question,
+          case_number: case_number,
+          lawyer_id: lawyerId,
+        }),
+        signal: controller.signal,
+      }
+    );
+
+    if (!externalResponse.ok || !externalResponse.body) {
+      console.error(
+        "RAG stream API Error:",
+        externalResponse.status,
+        externalResponse.statusText
+      );
+      return res.status(502).json({
+        message: "Failed to get response from RAG service",
+        error: `RAG API returned ${externalResponse.status}`,
+        details: externalResponse.statusText,
+      });
+    }
+
+    res.writeHead(200, {
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      Connection: "keep-alive",
+      "X-Accel-Buffering": "no",
+    });
+
+    // Relay the SSE frames unchanged
+    for await (const chunk of externalResponse.body) {
+      res.write(chunk);
+    }
+    res.end();
+  } catch (err) {
+    if (err.name === "AbortError") {
+      console.log("Client disconnected, RAG stream aborted");
+      return;
+    }
+
+    console.error("Error streaming from RAG service:", err);
+
+    if (res.headersSent) {
+      res.write(
+        `event: error\ndata: ${JSON.stringify({ error: err.message })}\n\n`
+      );
+      return res.end();
+    }
+
+    res.status(500).json({
+      message: "Error processing RAG request",
+      error: err.message,
+    });
+  }
+};
@@ -9,4 +9,7 @@ router.use(authenticateToken);
 // Communicate with RAG service
 router.post("/query", ragController.communicateWithRag);
 
+// Stream the RAG answer as server-sent events
+router.post("/query/stream", ragController.communicateWithRagStream);
+
 module.exports = router;
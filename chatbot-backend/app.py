@@ -1,19 +1,72 @@
-from flask import Flask, request, jsonify
-from utils.text_processing import extract_text_from_pdf
-from services.summarizer import summarize_text
-from services.vector_store import VectorStore
-from services.rag_chatbot import chatbot_response
-from utils.db import fetch_latest_hearing_pdf_by_case_number
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+import json
 import os
-import tempfile
+import sys
+import threading
+import time
+from utils.log import configure_logging
+from utils.text_processing import extract_text_from_pdf
+from services.summarizer import summarize_text, PROMPT_VERSION
+from services.summary_cache import summary_cache, pdf_digest
+from services.summary_batch import summarize_cases, SUMMARY_BATCH_MAX_CASES
+from services.ingest_queue import ingest_queue, ingest_workers, in_pool_child
+from services.resources import resources
+from services.rag_chatbot import chatbot_response, chatbot_response_stream
+from services.case_cache import case_index_cache
+from services.answer_cache import answer_cache
+from services.embedding_dispatcher import query_embedder
+from utils.db import fetch_latest_hearing_meta, fetch_hearing_pdf
+from utils.metrics import registry, span, REQUESTS, REQUEST_SECONDS
+
+configure_logging()
 
 app = Flask(__name__)
 
+# Cache and queue counters are read at scrape time rather than mirrored
+registry.gauge("nyayasetu_case_cache", "Case index cache counters.", ["stat"],
+               lambda: case_index_cache.stats())
+registry.gauge("nyayasetu_answer_cache", "Semantic answer cache counters.", ["stat"],
+               lambda: {k: v for k, v in answer_cache.stats().items() if k != "enabled"})
+registry.gauge("nyayasetu_summary_cache", "Summary cache counters.", ["stat"],
+               lambda: summary_cache.stats())
+registry.gauge("nyayasetu_query_embedder", "Query embedding dispatcher counters.", ["stat"],
+               lambda: {k: v for k, v in query_embedder.stats().items() if isinstance(v, (int, float))})
+registry.gauge("nyayasetu_ingest_jobs", "Ingest jobs by status.", ["status"],
+               lambda: ingest_queue.counts())
+registry.gauge("nyayasetu_resource_loaded", "Whether each lazily loaded resource is loaded.", ["resource"],
+               lambda: {name: int(r["loaded"]) for name, r in resources.status().items()})
+
+def start_background_work():
+    # Called by the process that serves requests: the __main__ block below or
+    # gunicorn's post_fork, never on import. PDF pool children still import
+    # this module as __mp_main__ and must not consume the queue.
+    if in_pool_child():
+        return
+    # Pick up jobs left queued by a previous run
+    ingest_workers.ensure_started()
+
+    # Preload models and indexes in the background so /readyz flips once warm
+    if os.getenv("WARMUP_ON_START", "0").lower() in ("1", "true", "yes") or "--warmup" in sys.argv:
+        threading.Thread(target=resources.warmup, name="warmup", daemon=True).start()
+
 try:
     store = None
 except Exception:
     store = None
 
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    # Streaming responses are timed until headers go out; the stream itself
+    # is covered by the rag.llm_stream stage
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - g.get("request_start", time.perf_counter()), route=route, method=request.method)
+    REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
 @app.route("/nyayasetu/store/hearing", methods=["POST"])
 def store_hearing():
     try:
@@ -32,42 +85,53 @@ def store_hearing():
         if not case_number:
             return jsonify({"error": "case_number required in headers or body"}), 400
         
-        temp_path = None
         try:
-            # Fetch the latest hearing PDF from MySQL database
-            result = fetch_latest_hearing_pdf_by_case_number(case_number)
+            # Look up the latest hearing without pulling the PDF blob
+            meta = fetch_latest_hearing_meta(case_number)
         except ValueError:
             return jsonify({"error": "case_number must be a valid string"}), 400
 
-        if not result:
+        if not meta:
             return jsonify({"error": "No hearing PDF found for this case_number"}), 404
-        
-        pdf_bytes, db_language = result
-
-        # Create temporary file to extract text from PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            temp_path = tmp.name
-            tmp.write(pdf_bytes)
-            
-        # Extract text from the PDF
-        text = extract_text_from_pdf(temp_path)
-
-        # Add/Update the document in vector database
-        case_store = VectorStore(case_number=case_number)
-        case_store.add_document(text)
-        
+
+        hearing_id = payload.get("hearing_id") or meta["hearing_id"]
+
+        job_id = ingest_queue.enqueue(case_number, hearing_id)
+        status = "queued"
+
+        # Callers that need the old blocking behaviour can ask for it; the job
+        # still goes through the queue so it never overlaps another job for
+        # the same case
+        if payload.get("sync"):
+            job = ingest_workers.run(job_id)
+            if job["status"] == "done":
+                return jsonify({**job["result"], "status": "success", "job_id": job_id})
+            if job["status"] == "failed":
+                return jsonify({"error": job["error"], "job_id": job_id, "status": "failed"}), 500
+            status = job["status"]
+
+        # Extraction and embedding run on the ingest workers; answer right away
+        ingest_workers.ensure_started()
+        ingest_workers.notify()
+
         return jsonify({
-            "message": "Hearing PDF successfully added/updated in vector database",
+            "message": "Hearing PDF queued for ingestion into vector database",
             "case_number": case_number,
-            "status": "success"
-        })
+            "hearing_id": hearing_id,
+            "job_id": job_id,
+            "status": status,
+            "status_url": f"/nyayasetu/store/jobs/{job_id}"
+        }), 202
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+
+@app.route("/nyayasetu/store/jobs/<job_id>", methods=["GET"])
+def ingest_job_status(job_id):
+    job = ingest_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
 @app.route("/nyayasetu/summary/getSummary", methods=["POST"])
 def get_summary():
@@ -90,17 +154,16 @@ def get_summary():
         if not case_number:
             return jsonify({"error": "case_number required in headers or body"}), 400
         
-        temp_path = None
         try:
-            # Fetch the hearing PDF from MySQL database
-            result = fetch_latest_hearing_pdf_by_case_number(case_number)
+            # Fetch the hearing metadata from MySQL database; the blob is only pulled on a cache miss
+            meta = fetch_latest_hearing_meta(case_number)
         except ValueError:
             return jsonify({"error": "case_number must be a valid string"}), 400
 
-        if not result:
+        if not meta:
             return jsonify({"error": "No hearing PDF found for this case_number"}), 404
         
-        pdf_bytes, db_language = result
+        db_language = meta["language"]
         
         # Use database language (client's preference) as primary, request lang as fallback
         if db_language and db_language.strip():
@@ -108,25 +171,65 @@ def get_summary():
         elif not lang:
             lang = "en"  # Default fallback
 
-        # Create temporary file to extract text from PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            temp_path = tmp.name
-            tmp.write(pdf_bytes)
-            
-        # Extract text from the hearing PDF
-        text = extract_text_from_pdf(temp_path)
+        # Same PDF bytes, language and prompt version -> same summary
+        known_digest = summary_cache.digest_for_hearing(meta)
+        if known_digest:
+            cached = summary_cache.get(summary_cache.make_key(known_digest, lang, PROMPT_VERSION))
+            if cached is not None:
+                return jsonify(cached)
+
+        pdf_bytes = fetch_hearing_pdf(meta["hearing_id"])
+        if not pdf_bytes:
+            return jsonify({"error": "No hearing PDF found for this case_number"}), 404
+
+        digest = pdf_digest(pdf_bytes)
+        cache_key = summary_cache.make_key(digest, lang, PROMPT_VERSION)
+        if digest != known_digest:
+            summary_cache.remember_hearing_digest(meta, digest)
+            cached = summary_cache.get(cache_key)
+            if cached is not None:
+                return jsonify(cached)
+
+        # Extract text from the hearing PDF in memory
+        text = extract_text_from_pdf(pdf_bytes)
 
         # Send extracted text to summarizer to get LLM response
-        summary = summarize_text(text, lang)
+        with span("summary.summarize", chars=len(text)):
+            summary = summarize_text(text, lang)
+        if "error" not in summary:
+            summary_cache.put(cache_key, digest, lang, PROMPT_VERSION, summary)
 
         return jsonify(summary)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+
+
+@app.route("/nyayasetu/summary/getSummaryBatch", methods=["POST"])
+def get_summary_batch():
+    payload = request.get_json(silent=True) or {}
+    case_numbers = payload.get("case_numbers")
+    lang = payload.get("lang") or payload.get("language")
+
+    if not isinstance(case_numbers, list) or not case_numbers:
+        return jsonify({"error": "case_numbers must be a non-empty list"}), 400
+    case_numbers = list(dict.fromkeys(str(c) for c in case_numbers if c not in (None, "")))
+    if len(case_numbers) > SUMMARY_BATCH_MAX_CASES:
+        return jsonify({"error": f"At most {SUMMARY_BATCH_MAX_CASES} case_numbers per request"}), 400
+
+    def lines():
+        try:
+            for result in summarize_cases(case_numbers, lang):
+                yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "error", "error": str(e)}) + "\n"
+
+    # One JSON object per line, flushed as each case finishes
+    return Response(
+        stream_with_context(lines()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route("/nyayasetu/rag/chat", methods=["POST"])
@@ -149,5 +252,71 @@ def chat():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route("/nyayasetu/rag/chat/stream", methods=["POST"])
+def chat_stream():
+    data = request.get_json() or {}
+    auth_header = request.headers.get('Authorization')
+
+    question = data.get("question")
+    case_number = data.get("case_number", None)
+
+    if not question:
+        return jsonify({"error": "Question is required"}), 400
+
+    def events():
+        try:
+            for event, payload in chatbot_response_stream(question, case_number=case_number, auth_header=auth_header):
+                if event == "delta":
+                    yield _sse("delta", {"text": payload})
+                else:
+                    yield _sse("result", payload)
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+    # stream_with_context closes the generator when the client disconnects,
+    # which in turn cancels the upstream LLM stream
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness: the process is up and serving, whatever is loaded
+    return jsonify({"status": "ok", "components": resources.status()})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    ready = resources.ready()
+    return jsonify({"ready": ready, "components": resources.status()}), 200 if ready else 503
+
+@app.route("/warmup", methods=["POST"])
+def warmup():
+    errors = resources.warmup()
+    return jsonify({"ready": resources.ready(), "errors": errors, "components": resources.status()}), 500 if errors else 200
+
+@app.route("/nyayasetu/rag/stats", methods=["GET"])
+def rag_stats():
+    return jsonify({
+        "case_cache": case_index_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "query_embedder": query_embedder.stats(),
+        "summary_cache": summary_cache.stats(),
+        "ingest_jobs": ingest_queue.counts(),
+    })
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
+    # Development server; serve production traffic with `gunicorn -c gunicorn.conf.py`.
+    # The debug reloader re-runs this file in a child that serves requests;
+    # only that child starts background work, not the file watcher.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_work()
     app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
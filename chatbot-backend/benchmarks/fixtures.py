@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import faiss
+import fitz
+import numpy as np
+
+from services.chunk_store import write_chunk_store
+
+LEGAL_WORDS = (
+    "appellant respondent petitioner accused court tribunal judgment order decree appeal revision "
+    "writ bail custody evidence witness testimony affidavit plaint summons warrant cognizance charge "
+    "sheet investigation magistrate sessions high supreme bench hearing adjournment stay injunction "
+    "damages compensation contract breach property possession tenancy eviction limitation jurisdiction "
+    "section act code penal criminal civil procedure constitution article fundamental right liberty "
+    "murder theft cheating forgery defamation negligence dowry cruelty maintenance divorce custody "
+    "arbitration award execution attachment decree-holder judgment-debtor counsel advocate prosecution "
+    "defence acquittal conviction sentence fine imprisonment probation remand quash dismissed allowed"
+).split()
+
+
+def _hash(text, seed=0):
+    return int.from_bytes(hashlib.blake2b(f"{seed}:{text}".encode(), digest_size=8).digest(), "little")
+
+
+class RandomEmbedder:
+    # Stand-in for the SentenceTransformer: words are hashed into a random
+    # embedding table, mean-pooled and passed through one random dense layer.
+    # Texts that share words land close together, so FAISS scores and the
+    # retrieval threshold behave roughly like they do with the real model,
+    # but absolute encode times are not comparable to a transformer.
+
+    def __init__(self, dim=768, vocab_size=50000, seed=0, max_seq_length=256):
+        rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.vocab_size = vocab_size
+        self.seed = seed
+        self.max_seq_length = max_seq_length
+        self.tokenizer = None
+        self.table = rng.standard_normal((vocab_size, dim), dtype=np.float32)
+        self.dense = rng.standard_normal((dim, dim), dtype=np.float32) / np.sqrt(dim)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _token_ids(self, text):
+        words = text.lower().split()[: self.max_seq_length] or [""]
+        return np.fromiter((_hash(w, self.seed) % self.vocab_size for w in words), dtype=np.int64)
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            pooled = np.stack([self.table[self._token_ids(t)].mean(axis=0) for t in batch])
+            out[start:start + len(batch)] = np.tanh(pooled @ self.dense)
+        return out[0] if single else out
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Stream:
+    def __init__(self, text, pieces, first_token_s, per_piece_s):
+        step = max(1, -(-len(text) // pieces))
+        self._parts = [text[i:i + step] for i in range(0, len(text), step)]
+        self._first_token_s = first_token_s
+        self._per_piece_s = per_piece_s
+
+    def __iter__(self):
+        time.sleep(self._first_token_s)
+        for i, part in enumerate(self._parts):
+            if i:
+                time.sleep(self._per_piece_s)
+            yield _Chunk(part)
+
+
+class StubLLM:
+    # Replaces genai.GenerativeModel: returns canned JSON shaped like the real
+    # chat / summary / section-notes responses after a configurable delay.
+
+    def __init__(self, latency_ms=0.0, first_token_ms=None, stream_pieces=20):
+        self.latency_s = latency_ms / 1000.0
+        self.first_token_s = (first_token_ms if first_token_ms is not None else latency_ms / 4) / 1000.0
+        self.stream_pieces = stream_pieces
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, prompt):
+        if "SECTION TEXT:" in prompt:
+            return "\n".join(f"- Note {i}: the court considered the submissions of counsel." for i in range(12))
+        if "lawyer_view" in prompt:
+            return json.dumps({
+                "lawyer_view": {"header": "Lawyer View (Full Technical, Point-wise)",
+                                "points": [f"Technical point {i} about the proceedings." for i in range(10)]},
+                "client_view": {"header": "Client View (Simple English Summary)",
+                                "points": [f"Plain point {i} for the client." for i in range(6)]},
+                "next_date": "Case closed",
+                "current_status": "Ongoing",
+                "lawyer_checkpoints": [f"Checkpoint {i}" for i in range(4)],
+            })
+        return json.dumps({
+            "answer": [f"Answer point {i} drawn from the retrieved context." for i in range(5)],
+            "IPC": [{"IPC Section 420": "Cheating : dishonest inducement to deliver property"}],
+            "CPC": "NaN",
+            "CRPC": [{"CRPC Section 437": "Bail : when bail may be taken in non-bailable offences"}],
+            "Supreme": [{"Case 1 of 2020": "details : relevant precedent on bail"}],
+        })
+
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        text = self._reply(prompt)
+        if stream:
+            remaining = max(0.0, self.latency_s - self.first_token_s)
+            return _Stream(text, self.stream_pieces, self.first_token_s, remaining / max(1, self.stream_pieces - 1))
+        time.sleep(self.latency_s)
+        return _Response(text)
+
+
+class SyntheticText:
+    def __init__(self, seed=0, extra_terms=2000):
+        self.rng = random.Random(seed)
+        self.vocab = LEGAL_WORDS + [f"term{i}" for i in range(extra_terms)]
+        # Zipf-like: a few words are very common, most are rare
+        self.weights = [1.0 / (rank + 1) for rank in range(len(self.vocab))]
+
+    def sentence(self, min_words=10, max_words=24):
+        words = self.rng.choices(self.vocab, self.weights, k=self.rng.randint(min_words, max_words))
+        if self.rng.random() < 0.3:
+            words.insert(self.rng.randrange(len(words)), f"Section {self.rng.randint(1, 511)} IPC")
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self, sentences=5):
+        return " ".join(self.sentence() for _ in range(sentences))
+
+    def query(self):
+        return self.sentence(6, 14).rstrip(".") + "?"
+
+
+def make_pdf(text_source, pages=10, lines_per_page=48):
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        lines = []
+        while len(lines) < lines_per_page:
+            sentence = text_source.sentence()
+            # Wrap at ~95 characters to stay inside the text box
+            while sentence:
+                lines.append(sentence[:95])
+                sentence = sentence[95:]
+        page.insert_textbox(fitz.Rect(36, 36, page.rect.width - 36, page.rect.height - 36),
+                            "\n".join(lines[:lines_per_page]), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def build_static_corpus(static_path, name, index_file, size, embedder, text_source, batch_size=1024):
+    os.makedirs(static_path, exist_ok=True)
+    chunks = [text_source.paragraph(3) for _ in range(size)]
+    index = faiss.IndexFlatIP(embedder.dim)
+    for start in range(0, size, batch_size):
+        vectors = np.ascontiguousarray(embedder.encode(chunks[start:start + batch_size], batch_size=batch_size))
+        faiss.normalize_L2(vectors)
+        index.add(vectors)
+    faiss.write_index(index, os.path.join(static_path, index_file))
+    write_chunk_store(os.path.join(static_path, name), chunks)
+    return chunks
+
+
+class FakeHearingDB:
+    # In-memory stand-in for the case_hearings/cases/clients join used by the
+    # fetch_* helpers in utils.db
+
+    def __init__(self):
+        self.hearings = {}
+        self._next_id = 1
+
+    def add(self, case_number, pdf_bytes, language="en"):
+        hearing_id = self._next_id
+        self._next_id += 1
+        created = datetime(2024, 1, 1) + timedelta(days=hearing_id)
+        self.hearings[hearing_id] = {
+            "hearing_id": hearing_id,
+            "case_number": str(case_number),
+            "hearing_name": f"Hearing {hearing_id}",
+            "created_at": created,
+            "updated_at": created,
+            "size": len(pdf_bytes),
+            "language": language,
+            "pdf": pdf_bytes,
+        }
+        return hearing_id
+
+    def fetch_hearing_meta(self, hearing_id):
+        row = self.hearings.get(int(hearing_id))
+        return {k: v for k, v in row.items() if k != "pdf"} if row else None
+
+    def fetch_latest_hearing_meta(self, case_number):
+        rows = [h for h in self.hearings.values() if h["case_number"] == str(case_number)]
+        if not rows:
+            return None
+        latest = max(rows, key=lambda h: (h["created_at"], h["hearing_id"]))
+        return self.fetch_hearing_meta(latest["hearing_id"])
+
+    def fetch_hearing_pdf(self, hearing_id):
+        row = self.hearings.get(int(hearing_id))
+        return row["pdf"] if row else None
+
+    def fetch_latest_hearing_meta_many(self, case_numbers):
+        metas = {str(c): self.fetch_latest_hearing_meta(c) for c in case_numbers}
+        return {c: meta for c, meta in metas.items() if meta}
+
+    def iter_hearing_pdfs(self, hearing_ids):
+        for hearing_id in hearing_ids:
+            row = self.hearings.get(int(hearing_id))
+            if row:
+                yield row["hearing_id"], row["pdf"]
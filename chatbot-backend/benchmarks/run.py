@@ -0,0 +1,377 @@
+"""Offline latency/throughput benchmarks for the chat, summary and ingest paths.
+
+Run from chatbot-backend/:
+
+    python -m benchmarks.run [--iterations 50] [--concurrency 4] [--static-size 20000]
+                             [--llm-latency-ms 0] [--only rag,http.rag_chat] [--out results.json]
+                             [--compare baseline.json]
+
+Nothing touches the network: Gemini is replaced by a stub returning canned
+JSON, the embedding model by a random-weight hashing embedder, MySQL by an
+in-memory hearing table, and the static corpora and hearing PDFs are
+generated into a scratch directory. Each benchmark reports p50/p95/p99
+latency and throughput, plus the same percentiles for every instrumented
+stage (utils.metrics spans) it exercised. Results are written as JSON;
+--compare prints the change against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize_latencies(latencies, wall_seconds):
+    import numpy as np
+
+    ms = np.asarray(latencies, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    summary = {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+    if wall_seconds:
+        summary["throughput_per_s"] = round(len(ms) / wall_seconds, 3)
+    return summary
+
+
+class StageRecorder:
+    # Keeps raw span durations so stages get exact percentiles rather than
+    # the bucketed view /metrics exposes
+
+    def __init__(self, histogram):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+        observe = histogram.observe
+
+        def recording_observe(value, **labels):
+            with self._lock:
+                self.samples[labels.get("stage", "")].append(value)
+            observe(value, **labels)
+
+        histogram.observe = recording_observe
+
+    def take(self):
+        with self._lock:
+            samples, self.samples = self.samples, defaultdict(list)
+        return {stage: summarize_latencies(values, None) for stage, values in sorted(samples.items())}
+
+
+def run_load(call, iterations, concurrency):
+    latencies = [None] * iterations
+
+    def timed_call(i):
+        start = time.perf_counter()
+        call(i)
+        latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(iterations):
+            timed_call(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed_call, range(iterations)))
+    return latencies, time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["benchmarks"]
+    print(f"\nChange vs {baseline_path}:")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before or not before.get("n") or not current.get("n"):
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s"):
+            if before.get(key):
+                deltas.append(f"{key} {100 * (current[key] - before[key]) / before[key]:+.1f}%")
+        print(f"  {name:<40} " + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--ingest-iterations", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--static-size", type=int, default=20000, help="chunks in the synthetic Supreme Court corpus")
+    parser.add_argument("--ref-size", type=int, default=2000, help="chunks in the synthetic statute corpus")
+    parser.add_argument("--cases", type=int, default=4)
+    parser.add_argument("--hearings-per-case", type=int, default=2)
+    parser.add_argument("--pdf-pages", default="5,60", help="comma-separated page counts for the extraction benchmark")
+    parser.add_argument("--hearing-pages", type=int, default=10)
+    parser.add_argument("--batch-cases", type=int, default=10, help="uncached cases per batch summary request")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="leave the semantic answer cache on (off by default so every chat runs the full path)")
+    parser.add_argument("--only", help="comma-separated benchmark name prefixes to run")
+    parser.add_argument("--workdir", help="scratch directory (default: a fresh temp dir, removed afterwards)")
+    parser.add_argument("--out", default="benchmark-results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    out_path = os.path.abspath(args.out)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nyayasetu-bench-")
+    cleanup = not args.workdir
+
+    # Every data/ path in the services is relative, so running inside the
+    # scratch directory keeps the real stores and caches untouched
+    sys.path.insert(0, BACKEND_DIR)
+    os.makedirs(os.path.join(workdir, "data", "cases"), exist_ok=True)
+    os.chdir(workdir)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["STATIC_INDEX_KIND"] = "flat"
+    os.environ["INGEST_WORKERS"] = "0"
+    os.environ["WARMUP_ON_START"] = "0"
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+    try:
+        results = run_benchmarks(args)
+    finally:
+        os.chdir(BACKEND_DIR)
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "workdir")},
+        },
+        "benchmarks": results,
+    }
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'benchmark':<40} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'req/s':>10}")
+    for name, result in results.items():
+        print(f"{name:<40} {result['n']:>5} {result['p50_ms']:>10} {result['p95_ms']:>10} "
+              f"{result['p99_ms']:>10} {result['throughput_per_s']:>10}")
+    print(f"\nWrote {out_path}")
+    if baseline_path:
+        compare(results, baseline_path)
+
+
+def run_benchmarks(args):
+    import jwt
+
+    from benchmarks.fixtures import (FakeHearingDB, RandomEmbedder, StubLLM, SyntheticText,
+                                     build_static_corpus, make_pdf)
+    from utils.log import configure_logging
+    from utils.metrics import STAGE_SECONDS
+    from utils.rate_limit import RateLimiter
+    import app as app_module
+    import services.ingestion as ingestion
+    import services.rag_chatbot as rag_chatbot
+    import services.summarizer as summarizer
+    import services.summary_batch as summary_batch
+    import utils.llm as llm_client
+    from services.answer_cache import answer_cache
+    from services.embedding_model import EmbeddingModel
+    from services.static_corpus import STATIC_PATH
+    from services.summarizer import summarize_text, SUMMARY_MAP_REDUCE_CHARS
+    from services.vector_store import VectorStore
+    from utils.text_processing import extract_pages_from_pdf, extract_text_from_pdf
+
+    configure_logging()
+    text_source = SyntheticText(args.seed)
+
+    embedder = RandomEmbedder(dim=args.dim, seed=args.seed)
+    EmbeddingModel._instance = embedder
+    llm = StubLLM(latency_ms=args.llm_latency_ms)
+    llm_client._llm_model = llm
+    answer_cache.enabled = args.answer_cache
+    summarizer.llm_rate_limiter = RateLimiter(0)
+
+    db = FakeHearingDB()
+    for module in (app_module, ingestion):
+        for name in ("fetch_latest_hearing_meta", "fetch_hearing_meta", "fetch_hearing_pdf"):
+            if hasattr(module, name):
+                setattr(module, name, getattr(db, name))
+    summary_batch.fetch_latest_hearing_meta_many = db.fetch_latest_hearing_meta_many
+    summary_batch.iter_hearing_pdfs = db.iter_hearing_pdfs
+
+    print(f"Building synthetic corpora ({args.static_size} + {args.ref_size} chunks)...")
+    build_static_corpus(STATIC_PATH, "chunks22-25", "legal22-25.index", args.static_size, embedder, text_source)
+    build_static_corpus(STATIC_PATH, "ref", "ref_emb.index", args.ref_size, embedder, text_source)
+
+    print(f"Ingesting {args.cases} cases x {args.hearings_per_case} hearings...")
+    case_numbers = [f"BENCH-{i}" for i in range(args.cases)]
+    for case_number in case_numbers:
+        for _ in range(args.hearings_per_case):
+            hearing_id = db.add(case_number, make_pdf(text_source, args.hearing_pages))
+            ingestion.ingest_hearing(case_number, hearing_id)
+
+    queries = [text_source.query() for _ in range(200)]
+    tokens = [jwt.encode({"userId": f"user-{i}"}, "offline-benchmark-signing-key-0000", algorithm="HS256") for i in range(8)]
+
+    def pick(i):
+        r = random.Random(args.seed * 1000003 + i)
+        return r.choice(queries), r.choice(case_numbers), f"Bearer {r.choice(tokens)}"
+
+    client_local = threading.local()
+
+    def client():
+        if not hasattr(client_local, "client"):
+            client_local.client = app_module.app.test_client()
+        return client_local.client
+
+    def expect_ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    benchmarks = []
+
+    def benchmark(name, iterations=None, concurrency=None, warmup=None):
+        def register(call):
+            benchmarks.append((name, call, iterations, concurrency, warmup))
+            return call
+        return register
+
+    for pages in [int(p) for p in args.pdf_pages.split(",") if p]:
+        pdf = make_pdf(text_source, pages)
+
+        benchmark(f"pdf.extract_text[pages={pages}]", concurrency=1)(lambda i, pdf=pdf: extract_text_from_pdf(pdf))
+
+    ingest_pdfs = [make_pdf(text_source, args.hearing_pages) for _ in range(args.ingest_iterations + args.warmup)]
+    ingest_pages = [extract_pages_from_pdf(pdf, workers=1) for pdf in ingest_pdfs]
+    ingest_store = VectorStore(case_number="BENCH-ADD", base_dir=rag_chatbot.CASES_PATH)
+
+    @benchmark("vector_store.add_document", iterations=args.ingest_iterations, concurrency=1)
+    def add_document(i):
+        pages = ingest_pages[i]
+        ingest_store.add_document("".join(pages), hearing_id=100000 + i, pages=pages)
+
+    @benchmark("rag.chatbot_response")
+    def chat_call(i):
+        query, case_number, auth = pick(i)
+        rag_chatbot.chatbot_response(query, case_number=case_number, auth_header=auth)
+
+    @benchmark("http.rag_chat")
+    def http_chat(i):
+        query, case_number, auth = pick(i)
+        expect_ok(client().post("/nyayasetu/rag/chat", json={"question": query, "case_number": case_number},
+                                headers={"Authorization": auth}))
+
+    first_event = []
+
+    @benchmark("http.rag_chat_stream")
+    def http_chat_stream(i):
+        query, case_number, auth = pick(i)
+        start = time.perf_counter()
+        response = expect_ok(client().post("/nyayasetu/rag/chat/stream",
+                                           json={"question": query, "case_number": case_number},
+                                           headers={"Authorization": auth}, buffered=False))
+        for n, _ in enumerate(response.response):
+            if n == 0:
+                first_event.append(time.perf_counter() - start)
+        response.close()
+
+    summary_case = "BENCH-SUMMARY"
+    db.add(summary_case, make_pdf(text_source, args.hearing_pages))
+
+    @benchmark("http.get_summary.cached")
+    def summary_cached(i):
+        expect_ok(client().post("/nyayasetu/summary/getSummary", json={"case_number": summary_case}))
+
+    uncached_cases = []
+    for i in range(args.iterations + args.warmup):
+        case_number = f"BENCH-SUMMARY-{i}"
+        db.add(case_number, make_pdf(text_source, args.hearing_pages))
+        uncached_cases.append(case_number)
+
+    @benchmark("http.get_summary.uncached", concurrency=1)
+    def summary_uncached(i):
+        expect_ok(client().post("/nyayasetu/summary/getSummary", json={"case_number": uncached_cases[i]}))
+
+    batches = []
+    for i in range(args.iterations + args.warmup):
+        batch = [f"BENCH-BATCH-{i}-{j}" for j in range(args.batch_cases)]
+        for case_number in batch:
+            db.add(case_number, make_pdf(text_source, args.hearing_pages))
+        batches.append(batch)
+
+    @benchmark("http.get_summary_batch.uncached", concurrency=1)
+    def summary_batch_uncached(i):
+        response = expect_ok(client().post("/nyayasetu/summary/getSummaryBatch", json={"case_numbers": batches[i]}))
+        done = json.loads(response.get_data(as_text=True).splitlines()[-1])
+        if done.get("ok") != len(batches[i]):
+            raise RuntimeError(f"batch summary incomplete: {done}")
+
+    short_text = extract_text_from_pdf(make_pdf(text_source, args.hearing_pages))
+    long_text = ""
+    while len(long_text) <= SUMMARY_MAP_REDUCE_CHARS:
+        long_text += text_source.paragraph(20) + "\n\n"
+
+    benchmark("summarizer.summarize_text")(lambda i: summarize_text(short_text, "en"))
+    benchmark("summarizer.summarize_text[map_reduce]")(lambda i: summarize_text(long_text, "en"))
+
+    store_case = "BENCH-STORE"
+    store_hearings = [db.add(store_case, pdf) for pdf in ingest_pdfs]
+
+    @benchmark("http.store_hearing.sync", iterations=args.ingest_iterations, concurrency=1)
+    def store_sync(i):
+        expect_ok(client().post("/nyayasetu/store/hearing",
+                                json={"case_number": store_case, "hearing_id": store_hearings[i], "sync": True}))
+
+    only = [p.strip() for p in args.only.split(",")] if args.only else None
+    recorder = StageRecorder(STAGE_SECONDS)
+    results = {}
+    for name, call, iterations, concurrency, warmup in benchmarks:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        iterations = iterations or args.iterations
+        concurrency = concurrency or args.concurrency
+        warmup = args.warmup if warmup is None else warmup
+        # Warm-up calls use negative indexes, which map to the spare fixtures
+        # at the end of each list
+        print(f"Running {name} ({iterations} iterations, concurrency {concurrency})...")
+        for i in range(warmup):
+            call(-1 - i)
+        recorder.take()
+        first_event.clear()
+        latencies, wall = run_load(call, iterations, concurrency)
+        results[name] = summarize_latencies(latencies, wall)
+        results[name]["concurrency"] = concurrency
+        results[name]["stages"] = recorder.take()
+        if name == "http.rag_chat_stream":
+            results[name]["first_event"] = summarize_latencies(first_event, None)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
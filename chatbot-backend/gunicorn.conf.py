@@ -0,0 +1,78 @@
+# Production serving: gunicorn -c gunicorn.conf.py   (run from chatbot-backend/)
+#
+# The app, the embedding model, the static FAISS indexes and chunk stores are
+# loaded once in the master and shared copy-on-write by the forked workers.
+# `kill -HUP <master pid>` reloads the static resources in the master and
+# replaces the workers gracefully, e.g. after rebuilding data/static.
+import gc
+import logging
+import os
+import sys
+
+wsgi_app = "app:app"
+bind = os.getenv("SERVE_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("SERVE_WORKERS", 2))
+# gthread: SSE chat streams hold a thread each for the length of the answer
+worker_class = "gthread"
+threads = int(os.getenv("SERVE_THREADS", 8))
+timeout = int(os.getenv("SERVE_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", 60))
+keepalive = int(os.getenv("SERVE_KEEPALIVE", 5))
+preload_app = True
+
+# Cores per worker for torch/FAISS intra-op parallelism; 0 divides the
+# machine evenly between workers so they do not oversubscribe it
+SERVE_TORCH_THREADS = int(os.getenv("SERVE_TORCH_THREADS", 0))
+# Warm these in the master before forking (default: everything registered)
+SERVE_PRELOAD = [n for n in os.getenv("SERVE_PRELOAD", "").split(",") if n]
+# Reloaded on SIGHUP; the embedding model is left alone
+SERVE_RELOAD = [n for n in os.getenv("SERVE_RELOAD", "supreme_corpus,ref_corpus,section_index").split(",") if n]
+
+logger = logging.getLogger("nyayasetu.serve")
+
+
+def _threads_per_worker():
+    return SERVE_TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _warm(names, load):
+    errors = load(names or None)
+    for name, error in errors.items():
+        logger.error("preload failed", extra={"resource": name, "error": error})
+    # Keep the loaded objects out of the collector's reach so GC passes in
+    # the workers do not write to (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def on_starting(server):
+    from services.resources import resources
+
+    # Nothing above may have spun up torch/OpenMP thread pools: forking a
+    # process with a live OpenMP pool can deadlock the children
+    _warm(SERVE_PRELOAD, resources.warmup)
+
+
+def on_reload(server):
+    from services.case_cache import case_index_cache
+    from services.resources import resources
+
+    gc.unfreeze()
+    _warm(SERVE_RELOAD, resources.reload)
+    case_index_cache.clear()
+
+
+def post_fork(server, worker):
+    n = _threads_per_worker()
+    # Honoured by torch/FAISS if they have not initialised their pools yet
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(n)
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(n)
+    if "faiss" in sys.modules:
+        import faiss
+        faiss.omp_set_num_threads(n)
+
+    import app
+    app.start_background_work()
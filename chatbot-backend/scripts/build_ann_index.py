@@ -0,0 +1,137 @@
+"""Build approximate-nearest-neighbour variants of the static FAISS indexes.
+
+Run from chatbot-backend/:
+
+    python -m scripts.build_ann_index --index legal22-25.index --kind ivf hnsw ivfpq
+
+Each variant is written next to the flat index as <name>.<kind>.index and
+benchmarked against it: recall@k and per-query latency for every
+nprobe/efSearch value, saved to <name>.ann_report.json. Select a variant at
+runtime with STATIC_INDEX_KIND (plus STATIC_NPROBE / STATIC_EF_SEARCH).
+"""
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+from services.static_corpus import STATIC_PATH, variant_path
+
+
+def build(kind, xb, args, metric):
+    # metric comes from the flat index, so variants score and rank the same way
+    d = xb.shape[1]
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, args.hnsw_m, metric)
+        index.hnsw.efConstruction = args.ef_construction
+    else:
+        nlist = args.nlist or max(1, int(4 * np.sqrt(len(xb))))
+        quantizer = faiss.IndexFlatIP(d) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(d)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist, metric)
+        elif kind == "ivfpq":
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, args.pq_m, args.pq_bits, metric)
+        else:
+            raise ValueError(f"Unknown index kind: {kind}")
+        rng = np.random.default_rng(0)
+        train_size = min(len(xb), max(nlist * 64, 10000))
+        index.train(xb[rng.choice(len(xb), train_size, replace=False)])
+        # Keep reconstruct() working for callers that need stored vectors
+        index.make_direct_map()
+
+    index.add(xb)
+    return index
+
+
+def sample_queries(xb, n, noise, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = xb[rng.choice(len(xb), min(n, len(xb)), replace=False)].copy()
+    queries += rng.normal(scale=noise, size=queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def evaluate(index, queries, ground_truth, k):
+    single = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, I = index.search(q[None, :], k)
+        single.append((time.perf_counter() - start) * 1000)
+        found[i] = I[0]
+
+    recall = np.mean([len(set(found[i]) & set(ground_truth[i])) / k for i in range(len(queries))])
+    single = np.array(single)
+    return {
+        "recall_at_k": round(float(recall), 4),
+        "latency_ms_p50": round(float(np.percentile(single, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(single, 95)), 3),
+        "latency_ms_mean": round(float(single.mean()), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--static-path", default=STATIC_PATH)
+    parser.add_argument("--index", default="legal22-25.index")
+    parser.add_argument("--kind", nargs="+", default=["ivf", "hnsw"], choices=["ivf", "hnsw", "ivfpq"])
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (default 4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-quantizers (must divide dim)")
+    parser.add_argument("--pq-bits", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.05, help="Gaussian noise added to sampled corpus vectors")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    flat_path = os.path.join(args.static_path, args.index)
+    flat = faiss.read_index(flat_path)
+    xb = flat.reconstruct_n(0, flat.ntotal).astype(np.float32)
+    if flat.metric_type not in (faiss.METRIC_INNER_PRODUCT, faiss.METRIC_L2):
+        parser.error(f"{args.index} uses FAISS metric {flat.metric_type}; only inner product and L2 are supported")
+    metric_name = "ip" if flat.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+    print(f"{args.index}: {flat.ntotal} vectors, dim {flat.d}, metric {metric_name}")
+
+    queries = sample_queries(xb, args.queries, args.noise)
+    _, ground_truth = flat.search(queries, args.k)
+    report = {"index": args.index, "ntotal": flat.ntotal, "metric": metric_name, "k": args.k, "queries": len(queries),
+              "flat": evaluate(flat, queries, ground_truth, args.k), "variants": {}}
+    print(f"flat      {report['flat']}")
+
+    for kind in args.kind:
+        start = time.perf_counter()
+        index = build(kind, xb, args, flat.metric_type)
+        build_seconds = time.perf_counter() - start
+        out_path = variant_path(flat_path, kind)
+        faiss.write_index(index, out_path + ".tmp")
+        os.replace(out_path + ".tmp", out_path)
+
+        param, values = ("efSearch", args.ef_search) if kind == "hnsw" else ("nprobe", args.nprobe)
+        results = []
+        space = faiss.ParameterSpace()
+        for value in values:
+            space.set_index_parameter(index, param, value)
+            result = {param: value, **evaluate(index, queries, ground_truth, args.k)}
+            results.append(result)
+            print(f"{kind:9} {result}")
+
+        report["variants"][kind] = {
+            "path": out_path,
+            "build_seconds": round(build_seconds, 2),
+            "size_bytes": os.path.getsize(out_path),
+            "results": results,
+        }
+
+    report_path = os.path.splitext(flat_path)[0] + ".ann_report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Build the exact statute-section lookup index over the static corpora.
+
+Run from chatbot-backend/:
+
+    python -m scripts.build_section_index [--static-path data/static] [--max-postings 50]
+
+Every chunk of the reference corpus (IPC/CrPC/CPC text) and of the Supreme
+Court corpus is scanned for citations such as "Section 302 IPC",
+"u/s 438 Cr.P.C." or "Order XXXIX Rule 1 CPC". Reference chunks that open
+with a provision (e.g. "302. Punishment for murder.--") are recorded as
+defining it and listed ahead of chunks that only cite it; a statute chunk
+that names no act inherits the act of the chunk before it. The result is
+written to <static-path>/sections.json, keyed "IPC:302", "CRPC:438",
+"CPC:O39R1", ... and loaded by the chat path for O(1) lookups.
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+from services.section_index import SECTION_INDEX_VERSION, dominant_act, extract_citations, heading_keys
+from services.static_corpus import STATIC_PATH, load_static_chunks
+
+# retrieval source name -> chunk store name
+SOURCES = {
+    "law": "ref",
+    "supreme": "chunks22-25",
+}
+
+
+def index_statutes(chunks, postings, max_postings):
+    defines, cites = defaultdict(list), defaultdict(list)
+    current_act = None
+    for i, chunk in enumerate(chunks):
+        current_act = dominant_act(chunk[:400]) or current_act
+        defined = heading_keys(chunk, current_act)
+        for key in defined:
+            defines[key].append(i)
+        for key in extract_citations(chunk):
+            if key not in defined:
+                cites[key].append(i)
+    for key in set(defines) | set(cites):
+        postings[key]["law"] = (defines[key] + cites[key])[:max_postings]
+    return len(defines)
+
+
+def index_judgments(chunks, postings, max_postings):
+    for i, chunk in enumerate(chunks):
+        for key in extract_citations(chunk):
+            ids = postings[key].setdefault("supreme", [])
+            if len(ids) < max_postings:
+                ids.append(i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--static-path", default=STATIC_PATH)
+    parser.add_argument("--max-postings", type=int, default=50, help="chunk ids kept per section and source")
+    parser.add_argument("--out", help="default: <static-path>/sections.json")
+    args = parser.parse_args()
+    out = args.out or os.path.join(args.static_path, "sections.json")
+
+    postings = defaultdict(dict)
+    sources = {}
+    for source, name in SOURCES.items():
+        start = time.perf_counter()
+        chunks = load_static_chunks(name, static_path=args.static_path)
+        if source == "law":
+            defined = index_statutes(chunks, postings, args.max_postings)
+            print(f"{name}: {len(chunks)} chunks, {defined} provisions defined", end="")
+        else:
+            index_judgments(chunks, postings, args.max_postings)
+            print(f"{name}: {len(chunks)} chunks", end="")
+        print(f", {time.perf_counter() - start:.1f}s")
+        sources[source] = {"chunks": name, "count": len(chunks)}
+
+    tmp = out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": SECTION_INDEX_VERSION, "sources": sources, "postings": postings}, f)
+    os.replace(tmp, out)
+    print(f"Wrote {len(postings)} sections to {out}")
+
+
+if __name__ == "__main__":
+    main()
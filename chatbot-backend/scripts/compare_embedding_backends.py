@@ -0,0 +1,136 @@
+"""Check a faster embedding backend against the fp32 model before switching.
+
+Run from chatbot-backend/:
+
+    python -m scripts.compare_embedding_backends [--backends int8 onnx] [--n 1000] [--min-cosine 0.99]
+    python -m scripts.compare_embedding_backends --export-onnx-int8 data/models/inlegal-onnx
+
+Samples chunks from the static corpus (or --texts, one per line), encodes
+them with fp32 PyTorch and each candidate backend, and reports per-text
+cosine agreement, top-k agreement when the same texts are used as queries
+against the static index, and encode throughput. Vectors must stay in the
+same space as the indexes were built with, so a backend below --min-cosine
+makes the script exit non-zero.
+
+--export-onnx-int8 saves an ONNX export plus a dynamically quantized copy
+into a local directory and prints the settings to serve it
+(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND=onnx, EMBEDDING_ONNX_FILE).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from services.embedding_model import EMBEDDING_BACKENDS, EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_FILE, load_embedding_model
+from services.static_corpus import load_static_chunks, load_static_index
+
+
+def sample_texts(args):
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        chunks = load_static_chunks(args.chunks)
+        step = max(1, len(chunks) // args.n)
+        texts = [chunks[i] for i in range(0, len(chunks), step)]
+    return texts[:args.n]
+
+
+def encode(model, texts, batch_size):
+    model.encode(texts[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    seconds = time.perf_counter() - start
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors, seconds
+
+
+def export_onnx_int8(args):
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(args.model, backend="onnx")
+    model.save(args.export_onnx_int8)
+    export_dynamic_quantized_onnx_model(model, args.quantization_config, args.export_onnx_int8)
+    print("Serve it with:")
+    print(f"  EMBEDDING_MODEL_NAME={args.export_onnx_int8}")
+    print("  EMBEDDING_BACKEND=onnx")
+    print(f"  EMBEDDING_ONNX_FILE=onnx/model_qint8_{args.quantization_config}.onnx")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"], choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--onnx-file", default=EMBEDDING_ONNX_FILE)
+    parser.add_argument("--texts", help="file with one text per line (default: sample the static corpus)")
+    parser.add_argument("--chunks", default="chunks22-25")
+    parser.add_argument("--index", default="legal22-25.index", help="static index for top-k agreement; '' to skip")
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="required mean cosine vs fp32")
+    parser.add_argument("--out", help="write the report as JSON")
+    parser.add_argument("--export-onnx-int8", metavar="DIR")
+    parser.add_argument("--quantization-config", default="avx512_vnni", choices=["arm64", "avx2", "avx512", "avx512_vnni"])
+    args = parser.parse_args()
+
+    if args.export_onnx_int8:
+        export_onnx_int8(args)
+        return
+
+    texts = sample_texts(args)
+    print(f"Comparing on {len(texts)} texts")
+
+    reference, reference_seconds = encode(load_embedding_model("torch", args.model), texts, args.batch_size)
+    index = load_static_index(args.index, kind="flat") if args.index else None
+    reference_ids = index.search(reference, args.k)[1] if index is not None else None
+
+    report = {"model": args.model, "texts": len(texts), "batch_size": args.batch_size, "backends": {}}
+    report["backends"]["torch"] = {"seconds": round(reference_seconds, 3),
+                                   "texts_per_s": round(len(texts) / reference_seconds, 1)}
+
+    failed = False
+    for backend in args.backends:
+        if backend == "torch":
+            continue
+        model = load_embedding_model(backend, args.model, args.onnx_file if backend == "onnx" else None)
+        vectors, seconds = encode(model, texts, args.batch_size)
+        cosine = (vectors * reference).sum(axis=1)
+        result = {
+            "seconds": round(seconds, 3),
+            "texts_per_s": round(len(texts) / seconds, 1),
+            "speedup": round(reference_seconds / seconds, 2),
+            "cosine_mean": round(float(cosine.mean()), 5),
+            "cosine_min": round(float(cosine.min()), 5),
+            "cosine_p01": round(float(np.percentile(cosine, 1)), 5),
+        }
+        if reference_ids is not None:
+            ids = index.search(vectors, args.k)[1]
+            overlap = [len(set(a) & set(b)) / args.k for a, b in zip(ids, reference_ids)]
+            result[f"top{args.k}_overlap"] = round(float(np.mean(overlap)), 4)
+            result["top1_agreement"] = round(float(np.mean(ids[:, 0] == reference_ids[:, 0])), 4)
+        result["passed"] = result["cosine_mean"] >= args.min_cosine
+        failed |= not result["passed"]
+        report["backends"][backend] = result
+
+    for backend, result in report["backends"].items():
+        print(f"{backend:>6}: " + ", ".join(f"{key}={value}" for key, value in result.items()))
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+    if failed:
+        print(f"At least one backend is below the {args.min_cosine} mean cosine threshold")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
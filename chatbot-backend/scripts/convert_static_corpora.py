@@ -0,0 +1,55 @@
+"""Convert the pickled static corpora into memory-mappable chunk stores.
+
+Run from chatbot-backend/:
+
+    python -m scripts.convert_static_corpora [--static-path data/static]
+
+Each <name>.pkl next to its FAISS index is written as <name>.blob +
+<name>.offsets.npy, and the index is checked to open with the mmap IO flag
+and to hold one vector per chunk.
+"""
+import argparse
+import os
+import pickle
+import time
+
+from services.chunk_store import MappedChunkStore, write_chunk_store
+from services.static_corpus import STATIC_PATH, load_static_index
+
+# chunk pickle name -> index file it belongs to
+CORPORA = {
+    "chunks22-25": "legal22-25.index",
+    "ref": "ref_emb.index",
+}
+
+
+def convert(static_path, name, index_file):
+    prefix = os.path.join(static_path, name)
+    start = time.perf_counter()
+    with open(prefix + ".pkl", "rb") as f:
+        chunks = pickle.load(f)
+    write_chunk_store(prefix, chunks)
+
+    store = MappedChunkStore(prefix)
+    assert len(store) == len(chunks)
+    assert all(store[i] == str(chunks[i]) for i in (0, len(chunks) // 2, len(chunks) - 1) if chunks)
+
+    index = load_static_index(index_file, static_path=static_path, use_mmap=True)
+    if index.ntotal != len(chunks):
+        print(f"WARNING: {index_file} has {index.ntotal} vectors but {name}.pkl has {len(chunks)} chunks")
+
+    blob_mb = os.path.getsize(prefix + ".blob") / 1e6
+    print(f"{name}: {len(chunks)} chunks, {blob_mb:.1f} MB blob, {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--static-path", default=STATIC_PATH)
+    args = parser.parse_args()
+
+    for name, index_file in CORPORA.items():
+        convert(args.static_path, name, index_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Rebuild every per-case vector store from the hearings in MySQL.
+
+Run from chatbot-backend/:
+
+    python -m scripts.reindex_cases [--workers 8] [--embed-batch 256] [--restart]
+
+Hearings are streamed case by case, a few PDFs per keyset query, their PDFs
+extracted in a process pool, and each case's chunks embedded together in
+large batches. A fresh store is built in the staging directory and swapped
+into data/cases/<case_number> with renames. Progress is checkpointed after
+every case, so an interrupted run resumes from the next case; cases that
+failed are retried first.
+
+The swap holds the case's lock in the ingest queue (INGEST_QUEUE_PATH, which
+must be the one the servers use), so it waits for a running ingest job on
+that case and no job starts until the new store is in place. Chat requests
+for the case see no case store for the instant between the two renames.
+A case with a hearing that cannot be extracted is not swapped, and its live
+store stays as it was.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from services.case_cache import case_index_cache
+from services.ingest_queue import ingest_queue
+from services.summary_cache import hearing_version
+from services.vector_store import VectorStore, chunk_document, embed_texts
+from utils.db import iter_hearings
+from utils.text_processing import extract_pages_from_pdf, pdf_pool_context
+
+
+def _extract(pdf_bytes):
+    # Each pool process extracts one PDF serially; parallelism is across PDFs
+    return extract_pages_from_pdf(pdf_bytes, workers=1)
+
+
+class Progress:
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.state = {"last_case": None, "cases": 0, "hearings": 0, "chunks": 0, "failed": []}
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state.update(json.load(f))
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def swap_in(case_number, staged_dir, live_dir, lock_timeout):
+    # staged_dir None clears the live store (the case no longer has any text)
+    owner = f"{socket.gethostname()}:{os.getpid()}:reindex"
+    if not ingest_queue.lock_case(case_number, owner, timeout=lock_timeout):
+        raise RuntimeError(f"an ingest job on case {case_number} is still running")
+    try:
+        old_dir = f"{live_dir}.old-{os.getpid()}"
+        if os.path.exists(live_dir):
+            os.rename(live_dir, old_dir)
+        if staged_dir is not None:
+            os.rename(staged_dir, live_dir)
+        case_index_cache.invalidate(live_dir)
+    finally:
+        ingest_queue.unlock_case(case_number, owner)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def build_case(case_number, hearings, args):
+    texts, metas = [], []
+    for row, pages in hearings:
+        hearing_texts, hearing_metas = chunk_document(pages, hearing_id=row["hearing_id"],
+                                                      hearing_version=hearing_version(row))
+        texts.extend(hearing_texts)
+        metas.extend(hearing_metas)
+
+    staged_dir = os.path.join(args.staging_dir, str(case_number))
+    shutil.rmtree(staged_dir, ignore_errors=True)
+    if texts:
+        store = VectorStore(case_number=case_number, base_dir=args.staging_dir)
+        store.add_chunks(texts, metas, embed_texts(texts, batch_size=args.embed_batch))
+        store.save()
+    swap_in(case_number, staged_dir if texts else None, os.path.join(args.cases_dir, str(case_number)),
+            args.lock_timeout)
+    return len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases-dir", default="data/cases")
+    parser.add_argument("--staging-dir", default="data/cases.reindex")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--embed-batch", type=int, default=256)
+    parser.add_argument("--case", nargs="*", help="Only rebuild these case numbers")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start over")
+    parser.add_argument("--lock-timeout", type=float, default=600,
+                        help="Seconds to wait for a running ingest job on a case before marking it failed")
+    args = parser.parse_args()
+
+    os.makedirs(args.staging_dir, exist_ok=True)
+    os.makedirs(args.cases_dir, exist_ok=True)
+    progress = Progress(os.path.join(args.staging_dir, "progress.json"), restart=args.restart)
+    state = progress.state
+    if state["last_case"] is not None:
+        print(f"Resuming after case {state['last_case']} ({state['cases']} cases done)")
+
+    # Cases that failed last time are retried before the run continues
+    retry = [c for c in state["failed"] if not args.case or c in args.case]
+    state["failed"] = [c for c in state["failed"] if c not in retry]
+
+    start = time.perf_counter()
+    run_hearings = run_chunks = 0
+    current_case, current_hearings, current_errors = None, [], []
+    advance = True
+
+    def flush():
+        nonlocal run_hearings, run_chunks
+        if current_case is None:
+            return
+        chunk_count = 0
+        if current_errors:
+            # Rebuilding without the unreadable hearings would lose their chunks
+            print(f"Case {current_case} failed: {len(current_errors)} hearing(s) could not be extracted")
+            state["failed"].append(current_case)
+        else:
+            try:
+                chunk_count = build_case(current_case, current_hearings, args)
+            except Exception as e:
+                print(f"Case {current_case} failed: {e}")
+                state["failed"].append(current_case)
+            else:
+                state["cases"] += 1
+                state["hearings"] += len(current_hearings)
+                state["chunks"] += chunk_count
+        run_hearings += len(current_hearings)
+        run_chunks += chunk_count
+        if advance:
+            state["last_case"] = current_case
+        progress.save()
+
+        elapsed = time.perf_counter() - start
+        print(f"case {current_case}: {len(current_hearings)} hearings, {chunk_count} chunks | "
+              f"total {state['cases']} cases | {run_hearings / elapsed:.2f} docs/s, {run_chunks / elapsed:.1f} chunks/s")
+
+    passes = []
+    if retry:
+        print(f"Retrying {len(retry)} failed case(s)")
+        passes.append((lambda: iter_hearings(case_numbers=retry), False))
+    passes.append((lambda: iter_hearings(after_case_number=state["last_case"], case_numbers=args.case), True))
+
+    # Extraction runs ahead of embedding by up to max_in_flight PDFs
+    max_in_flight = args.workers * 2
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=pdf_pool_context()) as pool:
+        for open_rows, advance in passes:
+            rows = open_rows()
+            in_flight = deque()
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    row = next(rows, None)
+                    if row is None:
+                        exhausted = True
+                        break
+                    pdf_bytes = row.pop("hearing_pdf")
+                    in_flight.append((row, pool.submit(_extract, pdf_bytes)))
+                if not in_flight:
+                    break
+
+                row, future = in_flight.popleft()
+                if row["case_number"] != current_case:
+                    flush()
+                    current_case, current_hearings, current_errors = row["case_number"], [], []
+                try:
+                    current_hearings.append((row, future.result()))
+                except Exception as e:
+                    print(f"Hearing {row['hearing_id']} of case {row['case_number']} could not be extracted: {e}")
+                    current_errors.append(row["hearing_id"])
+            flush()
+            current_case, current_hearings, current_errors = None, [], []
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {run_hearings} hearings, {run_chunks} chunks in {elapsed:.1f}s "
+          f"({run_hearings / elapsed if elapsed else 0:.2f} docs/s)")
+    if state["failed"]:
+        print(f"Failed cases: {', '.join(map(str, state['failed']))}")
+    else:
+        # Clean finish: the next run starts from the beginning again
+        os.remove(progress.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+# Cosine similarity between normalized query embeddings above which a stored
+# answer is reused; kept high so only rephrasings of the same question match
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 6 * 3600))
+ANSWER_CACHE_MAX_PER_CASE = int(os.getenv("ANSWER_CACHE_MAX_PER_CASE", 256))
+ANSWER_CACHE_MAX_CASES = int(os.getenv("ANSWER_CACHE_MAX_CASES", 512))
+
+
+class AnswerCache:
+    # Answers grouped by case and keyed on the query embedding. Each case
+    # bucket remembers the stamp it was filled under (the caller's resources
+    # generation plus case_cache.case_stamp); once the case is re-ingested or
+    # the corpora are reloaded the whole bucket is dropped.
+    # Within a bucket, expired answers are skipped and the least recently hit
+    # answer is evicted past max_per_case; whole buckets are LRU past max_cases.
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 max_per_case=ANSWER_CACHE_MAX_PER_CASE, max_cases=ANSWER_CACHE_MAX_CASES,
+                 enabled=ANSWER_CACHE_ENABLED):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_per_case = max_per_case
+        self.max_cases = max_cases
+        self.enabled = enabled
+        self._cases = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _bucket(self, case_key, stamp, create=False):
+        bucket = self._cases.get(case_key)
+        if bucket is not None and bucket["stamp"] != stamp:
+            del self._cases[case_key]
+            self.invalidations += 1
+            bucket = None
+        if bucket is None and create:
+            bucket = self._cases[case_key] = {"stamp": stamp, "entries": []}
+            while len(self._cases) > self.max_cases:
+                self._cases.popitem(last=False)
+                self.evictions += 1
+        if bucket is not None:
+            self._cases.move_to_end(case_key)
+        return bucket
+
+    def _expire(self, bucket, now):
+        live = [e for e in bucket["entries"] if now - e["created_at"] < self.ttl_seconds]
+        self.expirations += len(bucket["entries"]) - len(live)
+        bucket["entries"] = live
+
+    def get(self, case_key, embedding, stamp=None):
+        if not self.enabled:
+            return None
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        now = time.time()
+        with self._lock:
+            bucket = self._bucket(case_key, stamp)
+            if bucket is not None:
+                self._expire(bucket, now)
+            if not bucket or not bucket["entries"]:
+                self.misses += 1
+                return None
+            scores = np.stack([e["embedding"] for e in bucket["entries"]]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entry = bucket["entries"][best]
+            entry["last_hit"] = now
+            entry["hits"] += 1
+            self.hits += 1
+            return copy.deepcopy(entry["response"]), float(scores[best])
+
+    def put(self, case_key, embedding, response, stamp=None):
+        if not self.enabled:
+            return
+        vector = np.array(embedding, dtype=np.float32).reshape(-1)
+        now = time.time()
+        with self._lock:
+            bucket = self._bucket(case_key, stamp, create=True)
+            self._expire(bucket, now)
+            bucket["entries"].append({
+                "embedding": vector,
+                "response": copy.deepcopy(response),
+                "created_at": now,
+                "last_hit": now,
+                "hits": 0,
+            })
+            if len(bucket["entries"]) > self.max_per_case:
+                coldest = min(range(len(bucket["entries"])), key=lambda i: bucket["entries"][i]["last_hit"])
+                del bucket["entries"][coldest]
+                self.evictions += 1
+
+    def invalidate(self, case_key):
+        with self._lock:
+            if self._cases.pop(case_key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._cases.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "cases": len(self._cases),
+                "entries": sum(len(b["entries"]) for b in self._cases.values()),
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+answer_cache = AnswerCache()
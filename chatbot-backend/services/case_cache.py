@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import OrderedDict
+
+CASE_CACHE_MAX_ENTRIES = int(os.getenv("CASE_CACHE_MAX_ENTRIES", 64))
+CASE_CACHE_MAX_BYTES = int(os.getenv("CASE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def case_stamp(case_dir):
+    # manifest.json is replaced on every commit, so its mtime/size identify
+    # the on-disk version of the case, also across worker processes.
+    try:
+        st = os.stat(os.path.join(case_dir, "manifest.json"))
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _estimate_bytes(index, chunks):
+    return index.ntotal * index.d * 4 + sum(len(c) for c in chunks)
+
+
+class CaseIndexCache:
+    def __init__(self, max_entries=CASE_CACHE_MAX_ENTRIES, max_bytes=CASE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, case_dir, loader):
+        key = os.path.abspath(case_dir)
+        stamp = case_stamp(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and stamp is not None and entry["stamp"] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["index"], entry["chunks"]
+            if entry is not None:
+                self._drop(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        index, chunks = loader()
+
+        if stamp is not None:
+            with self._lock:
+                if key in self._entries:
+                    self._drop(key)
+                size = _estimate_bytes(index, chunks)
+                self._entries[key] = {"stamp": stamp, "index": index, "chunks": chunks, "bytes": size}
+                self._bytes += size
+                self._evict()
+        return index, chunks
+
+    def invalidate(self, case_dir):
+        key = os.path.abspath(case_dir)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["bytes"]
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+
+case_index_cache = CaseIndexCache()
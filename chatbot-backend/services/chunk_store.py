@@ -0,0 +1,67 @@
+import mmap
+import operator
+import os
+import numpy as np
+
+# A read-only list of strings stored as one contiguous UTF-8 blob
+# (<prefix>.blob) plus an int64 array of n+1 byte offsets
+# (<prefix>.offsets.npy). Both are memory-mapped, so every worker process
+# serving the same corpus shares the pages through the OS page cache instead
+# of holding a private unpickled copy.
+
+
+def write_chunk_store(prefix, chunks):
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    blob_tmp = prefix + ".blob.tmp"
+    with open(blob_tmp, "wb") as f:
+        position = 0
+        for i, chunk in enumerate(chunks):
+            data = str(chunk).encode("utf-8")
+            f.write(data)
+            position += len(data)
+            offsets[i + 1] = position
+        f.flush()
+        os.fsync(f.fileno())
+
+    offsets_tmp = prefix + ".offsets.tmp.npy"
+    np.save(offsets_tmp, offsets)
+    os.replace(offsets_tmp, prefix + ".offsets.npy")
+    os.replace(blob_tmp, prefix + ".blob")
+
+
+def chunk_store_exists(prefix):
+    return os.path.exists(prefix + ".blob") and os.path.exists(prefix + ".offsets.npy")
+
+
+class MappedChunkStore:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._offsets = np.load(prefix + ".offsets.npy", mmap_mode="r")
+        with open(prefix + ".blob", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap refuses zero-length files
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if int(self._offsets[-1]) != size:
+            raise RuntimeError(f"Chunk store {prefix} is inconsistent: offsets end at {int(self._offsets[-1])}, blob has {size} bytes")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._blob[start:end].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 3000))
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", 0.95))
+
+
+def approx_tokens(text):
+    # Gemini averages roughly four characters per token on English legal text
+    return max(1, len(text) // 4)
+
+
+def dedupe_hits(hits, threshold=RAG_DEDUP_THRESHOLD):
+    # hits must be sorted by score; the best of each near-duplicate group survives
+    kept, kept_vectors, seen_texts = [], [], set()
+    dropped = 0
+    for hit in hits:
+        text_key = " ".join(hit["text"].split())
+        vector = hit.get("vector")
+        duplicate = text_key in seen_texts
+        if not duplicate and vector is not None and kept_vectors:
+            duplicate = float(np.max(np.stack(kept_vectors) @ vector)) >= threshold
+        if duplicate:
+            dropped += 1
+            continue
+        kept.append(hit)
+        seen_texts.add(text_key)
+        if vector is not None:
+            kept_vectors.append(vector)
+    return kept, dropped
+
+
+def allocate_budget(hits, budget=RAG_CONTEXT_TOKENS):
+    # Each source gets a share of the budget proportional to the summed score
+    # of its hits; whatever a source leaves unused goes to the best remaining
+    # hits overall.
+    weights = {}
+    for hit in hits:
+        weights[hit["source"]] = weights.get(hit["source"], 0.0) + max(hit["score"], 0.0)
+    total_weight = sum(weights.values()) or 1.0
+    shares = {source: budget * weight / total_weight for source, weight in weights.items()}
+
+    selected, used = set(), {source: 0 for source in weights}
+    for i, hit in enumerate(hits):
+        cost = approx_tokens(hit["text"])
+        if used[hit["source"]] + cost <= shares[hit["source"]]:
+            selected.add(i)
+            used[hit["source"]] += cost
+
+    spent = sum(used.values())
+    for i, hit in enumerate(hits):
+        if i in selected:
+            continue
+        cost = approx_tokens(hit["text"])
+        if spent + cost <= budget:
+            selected.add(i)
+            spent += cost
+
+    if not selected and hits:
+        # The best hit alone is over budget: send a truncated copy of it
+        # rather than no context at all
+        top = dict(hits[0], text=hits[0]["text"][:budget * 4], truncated=True)
+        return [top], approx_tokens(top["text"])
+
+    return [hit for i, hit in enumerate(hits) if i in selected], spent
+
+
+def build_context(hits, budget=RAG_CONTEXT_TOKENS, threshold=RAG_DEDUP_THRESHOLD):
+    unique, duplicates = dedupe_hits(hits, threshold)
+    selected, tokens = allocate_budget(unique, budget)
+    used = {(hit["source"], hit["id"]) for hit in selected}
+    for hit in hits:
+        hit["used"] = (hit["source"], hit["id"]) in used
+    stats = {
+        "retrieved": len(hits),
+        "duplicates_dropped": duplicates,
+        "over_budget_dropped": len(unique) - len(selected),
+        "context_tokens": tokens,
+        "budget_tokens": budget,
+    }
+    return selected, stats
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import datetime
+
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "sqlite").lower()
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "data/conversation_memory.sqlite3")
+MEMORY_TTL_SECONDS = int(os.getenv("MEMORY_TTL_SECONDS", 7 * 24 * 3600))
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", 10))
+MEMORY_MAX_TURNS_PER_USER = int(os.getenv("MEMORY_MAX_TURNS_PER_USER", 200))
+MEMORY_RESPONSE_CHARS = 500
+
+# Expired rows are purged once every this many appends
+_PURGE_EVERY = 100
+
+
+def _turn(query, response, created_at):
+    return {
+        "query": query,
+        "response": response,
+        "timestamp": datetime.fromtimestamp(created_at).isoformat(),
+    }
+
+
+class MemoryBackend(ABC):
+    @abstractmethod
+    def get_recent(self, user_id, case_number, limit):
+        ...
+
+    @abstractmethod
+    def append(self, user_id, case_number, query, response):
+        ...
+
+
+class InMemoryBackend(MemoryBackend):
+    # Single-process fallback with the same TTL and caps as the SQLite backend
+
+    def __init__(self, ttl=MEMORY_TTL_SECONDS, max_turns=MEMORY_MAX_TURNS, max_turns_per_user=MEMORY_MAX_TURNS_PER_USER):
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.max_turns_per_user = max_turns_per_user
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def get_recent(self, user_id, case_number, limit):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            turns = self._users.get(user_id, {}).get(case_number, ())
+            recent = [t for t in list(turns)[-limit:] if t[2] >= cutoff]
+        return [_turn(*t) for t in recent]
+
+    def append(self, user_id, case_number, query, response):
+        with self._lock:
+            cases = self._users.setdefault(user_id, OrderedDict())
+            turns = cases.setdefault(case_number, deque(maxlen=self.max_turns))
+            cases.move_to_end(case_number)
+            turns.append((query, response[:MEMORY_RESPONSE_CHARS], time.time()))
+
+            # Trim the least recently used conversations past the per-user cap
+            total = sum(len(t) for t in cases.values())
+            while total > self.max_turns_per_user:
+                oldest_case, oldest_turns = next(iter(cases.items()))
+                oldest_turns.popleft()
+                total -= 1
+                if not oldest_turns:
+                    del cases[oldest_case]
+
+
+class SQLiteMemoryBackend(MemoryBackend):
+    # Shared by every worker process on the host through one WAL-mode
+    # database. The (user_id, case_number, id) index makes fetching the last
+    # N turns a single index range scan regardless of history size.
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        case_number TEXT NOT NULL,
+        query TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_turns_conversation ON turns (user_id, case_number, id);
+    CREATE INDEX IF NOT EXISTS idx_turns_user ON turns (user_id, id);
+    CREATE INDEX IF NOT EXISTS idx_turns_created ON turns (created_at);
+    """
+
+    def __init__(self, path=MEMORY_DB_PATH, ttl=MEMORY_TTL_SECONDS, max_turns=MEMORY_MAX_TURNS,
+                 max_turns_per_user=MEMORY_MAX_TURNS_PER_USER):
+        self.path = path
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.max_turns_per_user = max_turns_per_user
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._appends = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._initialized:
+                    conn.executescript(self._SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def get_recent(self, user_id, case_number, limit):
+        rows = self._connect().execute(
+            """SELECT query, response, created_at FROM turns
+               WHERE user_id = ? AND case_number = ? AND created_at >= ?
+               ORDER BY id DESC LIMIT ?""",
+            (user_id, case_number, time.time() - self.ttl, limit),
+        ).fetchall()
+        return [_turn(*row) for row in reversed(rows)]
+
+    def append(self, user_id, case_number, query, response):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT INTO turns (user_id, case_number, query, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, case_number, query, response[:MEMORY_RESPONSE_CHARS], now),
+            )
+            conn.execute(
+                """DELETE FROM turns WHERE user_id = ? AND case_number = ? AND id <= (
+                       SELECT id FROM turns WHERE user_id = ? AND case_number = ?
+                       ORDER BY id DESC LIMIT 1 OFFSET ?)""",
+                (user_id, case_number, user_id, case_number, self.max_turns),
+            )
+            conn.execute(
+                """DELETE FROM turns WHERE user_id = ? AND id <= (
+                       SELECT id FROM turns WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)""",
+                (user_id, user_id, self.max_turns_per_user),
+            )
+
+        with self._lock:
+            self._appends += 1
+            purge = self._appends % _PURGE_EVERY == 0
+        if purge:
+            with conn:
+                conn.execute("DELETE FROM turns WHERE created_at < ?", (now - self.ttl,))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_memory_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if MEMORY_BACKEND == "memory":
+                _backend = InMemoryBackend()
+            elif MEMORY_BACKEND == "sqlite":
+                _backend = SQLiteMemoryBackend()
+            else:
+                raise ValueError(f"Unknown MEMORY_BACKEND: {MEMORY_BACKEND}")
+        return _backend
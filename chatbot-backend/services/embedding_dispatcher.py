@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+import faiss
+import numpy as np
+
+from services.embedding_model import EmbeddingModel
+from utils.metrics import STAGE_SECONDS
+
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 32))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 2048))
+
+
+def normalize_query(query):
+    return " ".join(query.split())
+
+
+class EmbeddingDispatcher:
+    # Queries arriving within window_ms of each other are encoded in one
+    # batched forward pass by a single background thread; repeated queries
+    # are answered from an LRU cache without touching the model.
+
+    def __init__(self, model_getter=EmbeddingModel.get_model, window_ms=EMBED_BATCH_WINDOW_MS,
+                 max_batch=EMBED_MAX_BATCH, cache_size=QUERY_CACHE_SIZE):
+        self.model_getter = model_getter
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self._queue = queue.Queue()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.encode_seconds = 0.0
+
+    def embed(self, query):
+        return self.embed_many([query])
+
+    def embed_many(self, queries):
+        texts = [normalize_query(q) for q in queries]
+        results = [None] * len(texts)
+        futures = {}
+
+        with self._lock:
+            self.requests += len(texts)
+            # Keyed on the exact text that is encoded: the model is cased, so
+            # "Bail" and "bail" do not share a vector
+            for i, text in enumerate(texts):
+                cached = self._cache.get(text)
+                if cached is not None:
+                    self._cache.move_to_end(text)
+                    self.cache_hits += 1
+                    results[i] = cached
+                else:
+                    futures[i] = Future()
+            self._ensure_worker()
+
+        for i, future in futures.items():
+            self._queue.put((texts[i], future))
+        for i, future in futures.items():
+            results[i] = future.result()
+
+        return np.stack(results).astype(np.float32, copy=True)
+
+    def stats(self):
+        with self._lock:
+            encoded = sum(size * count for size, count in self.batch_sizes.items())
+            return {
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self._cache),
+                "batches": self.batches,
+                "mean_batch_size": round(encoded / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": max(self.batch_sizes) if self.batch_sizes else 0,
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+                "encode_seconds": round(self.encode_seconds, 3),
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+            }
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-dispatcher", daemon=True)
+            self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Identical queries in one window share a single row
+            unique = list(OrderedDict.fromkeys(text for text, _ in batch))
+            try:
+                start = time.perf_counter()
+                model = self.model_getter()
+                embeddings = model.encode(unique, batch_size=len(unique), convert_to_numpy=True)
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+                faiss.normalize_L2(embeddings)
+                elapsed = time.perf_counter() - start
+                STAGE_SECONDS.observe(elapsed, stage="embedding.encode_batch")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            rows = dict(zip(unique, embeddings))
+            with self._lock:
+                self.batches += 1
+                self.batch_sizes[len(unique)] += 1
+                self.encode_seconds += elapsed
+                for text, row in rows.items():
+                    self._cache[text] = row
+                    self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+            for text, future in batch:
+                future.set_result(rows[text])
+
+
+query_embedder = EmbeddingDispatcher()
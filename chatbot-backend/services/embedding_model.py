@@ -1,11 +1,58 @@
-from sentence_transformers import SentenceTransformer
+import logging
+import os
+from services.resources import resources
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "bhavyagiri/InLegal-Sbert")
+
+# torch: fp32 PyTorch (reference)
+# int8:  PyTorch with dynamic int8 quantization of every Linear layer
+# onnx:  exported ONNX graph on onnxruntime; point EMBEDDING_ONNX_FILE at a
+#        quantized export (see scripts/compare_embedding_backends.py) for int8
+# All three produce vectors in the same space, so existing indexes stay valid.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE")
+# 0 leaves the runtime default (all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))
+
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+
+logger = logging.getLogger(__name__)
+
+def load_embedding_model(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL_NAME, onnx_file=EMBEDDING_ONNX_FILE):
+    # Imported here: sentence_transformers pulls in torch, which is slow to import
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}")
+    if EMBEDDING_THREADS:
+        torch.set_num_threads(EMBEDDING_THREADS)
+    logger.info("loading embedding model", extra={"model": model_name, "backend": backend, "onnx_file": onnx_file})
+
+    if backend == "onnx":
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if onnx_file:
+            model_kwargs["file_name"] = onnx_file
+        try:
+            return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        except (TypeError, ImportError) as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=onnx needs sentence-transformers>=3.2 and optimum[onnxruntime]"
+            ) from e
+
+    model = SentenceTransformer(model_name, device="cpu" if backend == "int8" else None)
+    if backend == "int8":
+        model.eval()
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+resources.register("embedding_model", load_embedding_model)
 
 class EmbeddingModel:
     _instance = None
     
     @classmethod
-    def get_model(cls, model_name="bhavyagiri/InLegal-Sbert"):
+    def get_model(cls):
         if cls._instance is None:
-            print(f"Loading embedding model: {model_name}")
-            cls._instance = SentenceTransformer(model_name)
-        return cls._instance
\ No newline at end of file
+            cls._instance = resources.get("embedding_model")
+        return cls._instance
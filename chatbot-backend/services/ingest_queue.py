@@ -0,0 +1,297 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from services.ingestion import HearingNotFound, ingest_hearing
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "data/ingest_jobs.sqlite3")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", 3))
+# A running job whose heartbeat is older than this is assumed to belong to a
+# dead worker and is put back on the queue
+INGEST_STALE_SECONDS = int(os.getenv("INGEST_STALE_SECONDS", 300))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", 1.0))
+# How long a sync store request waits for its job before answering 202
+INGEST_SYNC_TIMEOUT_SECONDS = float(os.getenv("INGEST_SYNC_TIMEOUT_SECONDS", 300))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    case_number TEXT NOT NULL,
+    hearing_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_case ON jobs (case_number, status);
+CREATE TABLE IF NOT EXISTS case_locks (
+    case_number TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    acquired_at REAL NOT NULL
+);
+"""
+
+
+class IngestQueue:
+    # Persistent job queue in a local SQLite database. Claiming a job and
+    # checking that no other job for the same case is running happen in one
+    # write transaction, so uploads for a case are ingested one at a time even
+    # with several worker processes.
+
+    def __init__(self, path=INGEST_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            with self._lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, case_number, hearing_id):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-uploading the same hearing before it was picked up reuses the queued job
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE case_number = ? AND hearing_id = ? AND status = 'queued'",
+                (case_number, hearing_id),
+            ).fetchone()
+            if row:
+                job_id = row["id"]
+            else:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, case_number, hearing_id, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                    (job_id, case_number, hearing_id, time.time()),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, worker, job_id=None):
+        # job_id restricts the claim to that job (sync requests run their own)
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A job whose worker stopped heartbeating is retried, unless it
+            # already used up its attempts (e.g. it keeps crashing the worker)
+            conn.execute(
+                """UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                       error = CASE WHEN attempts >= ? THEN 'worker stopped responding' ELSE error END,
+                       finished_at = CASE WHEN attempts >= ? THEN ? ELSE finished_at END,
+                       worker = NULL
+                   WHERE status = 'running' AND heartbeat < ?""",
+                (INGEST_MAX_ATTEMPTS, INGEST_MAX_ATTEMPTS, INGEST_MAX_ATTEMPTS, now, now - INGEST_STALE_SECONDS),
+            )
+            row = conn.execute(
+                """SELECT * FROM jobs WHERE status = 'queued' AND (? IS NULL OR id = ?)
+                   AND case_number NOT IN (SELECT case_number FROM jobs WHERE status = 'running')
+                   AND case_number NOT IN (SELECT case_number FROM case_locks WHERE acquired_at >= ?)
+                   ORDER BY created_at LIMIT 1""",
+                (job_id, job_id, now - INGEST_STALE_SECONDS),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    """UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?,
+                       started_at = ?, heartbeat = ? WHERE id = ?""",
+                    (worker, now, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(row) if row else None
+
+    def lock_case(self, case_number, owner, timeout=INGEST_SYNC_TIMEOUT_SECONDS):
+        # Keeps ingest jobs off a case while something else rewrites its store
+        # (scripts/reindex_cases.py). Waits for a running job on the case to
+        # finish; returns False if the case is still busy after timeout. Locks
+        # older than INGEST_STALE_SECONDS are treated as abandoned.
+        case_number = str(case_number)
+        deadline = time.monotonic() + timeout
+        while True:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM case_locks WHERE acquired_at < ?", (now - INGEST_STALE_SECONDS,))
+                busy = conn.execute(
+                    """SELECT 1 FROM jobs WHERE case_number = ? AND status = 'running'
+                       UNION ALL SELECT 1 FROM case_locks WHERE case_number = ?""",
+                    (case_number, case_number),
+                ).fetchone()
+                if not busy:
+                    conn.execute("INSERT INTO case_locks (case_number, owner, acquired_at) VALUES (?, ?, ?)",
+                                 (case_number, owner, now))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if not busy:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(INGEST_POLL_SECONDS, remaining))
+
+    def unlock_case(self, case_number, owner):
+        self._connect().execute("DELETE FROM case_locks WHERE case_number = ? AND owner = ?", (str(case_number), owner))
+
+    def heartbeat(self, job_id):
+        self._connect().execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+
+    def complete(self, job_id, result):
+        self._connect().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ? WHERE id = ?",
+            (json.dumps(result), time.time(), job_id),
+        )
+
+    def fail(self, job_id, error, retry):
+        status = "queued" if retry else "failed"
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ?, worker = NULL WHERE id = ?",
+            (status, error, time.time(), job_id),
+        )
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+def in_pool_child():
+    # Spawn/forkserver children (the PDF extraction pool) re-import the
+    # parent's __main__ as __mp_main__; gunicorn workers are plain forks and
+    # keep the name MainProcess
+    return multiprocessing.current_process().name != "MainProcess"
+
+
+class IngestWorkerPool:
+    def __init__(self, job_queue, workers=INGEST_WORKERS):
+        self.queue = job_queue
+        self.workers = workers
+        self._threads = []
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Threads do not survive fork, so a forked worker process starts its own
+        if in_pool_child():
+            logger.debug("not starting ingest workers in a pool child process")
+            return
+        with self._lock:
+            if self._pid == os.getpid() or self.workers <= 0:
+                return
+            self._pid = os.getpid()
+            self._threads = []
+            for i in range(self.workers):
+                name = f"{socket.gethostname()}:{os.getpid()}:ingest-{i}"
+                thread = threading.Thread(target=self._run, args=(name,), name=f"ingest-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def run(self, job_id, timeout=INGEST_SYNC_TIMEOUT_SECONDS):
+        # Runs a queued job in the calling thread once no other job for its
+        # case is running, or waits while a worker has it. Returns the job as
+        # last seen: done, failed, or still pending when the timeout expires.
+        deadline = time.monotonic() + timeout
+        name = f"{socket.gethostname()}:{os.getpid()}:sync-{threading.get_ident()}"
+        while True:
+            try:
+                job = self.queue.claim(name, job_id=job_id)
+            except sqlite3.OperationalError as e:
+                logger.warning("ingest queue busy", extra={"error": str(e)})
+                job = None
+            if job is not None:
+                self._process(job)
+            job = self.queue.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in ("done", "failed") or remaining <= 0:
+                return job
+            time.sleep(min(INGEST_POLL_SECONDS, remaining))
+
+    def _run(self, name):
+        while True:
+            try:
+                job = self.queue.claim(name)
+            except sqlite3.OperationalError as e:
+                logger.warning("ingest queue busy", extra={"error": str(e)})
+                job = None
+            if job is None:
+                self._wakeup.wait(INGEST_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            self._process(job)
+
+    def _process(self, job):
+        stop = threading.Event()
+
+        def beat():
+            # A missed beat is retried on the next tick; letting the thread die
+            # would get the job requeued while it is still running
+            while not stop.wait(INGEST_STALE_SECONDS / 3):
+                try:
+                    self.queue.heartbeat(job["id"])
+                except Exception as e:
+                    logger.warning("ingest heartbeat failed", extra={"job_id": job["id"], "error": str(e)})
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        try:
+            with span("ingest.job", job_id=job["id"]):
+                result = ingest_hearing(job["case_number"], job["hearing_id"])
+            self.queue.complete(job["id"], result)
+        except HearingNotFound as e:
+            self.queue.fail(job["id"], str(e), retry=False)
+        except Exception as e:
+            logger.exception("ingest job failed", extra={"job_id": job["id"], "case_number": job["case_number"]})
+            self.queue.fail(job["id"], str(e), retry=job["attempts"] < INGEST_MAX_ATTEMPTS)
+        finally:
+            stop.set()
+
+
+ingest_queue = IngestQueue()
+ingest_workers = IngestWorkerPool(ingest_queue)
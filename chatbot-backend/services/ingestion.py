@@ -0,0 +1,46 @@
+from services.summary_cache import hearing_version
+from services.vector_store import VectorStore
+from utils.db import fetch_hearing_meta, fetch_hearing_pdf
+from utils.text_processing import extract_pages_from_pdf
+
+
+class HearingNotFound(Exception):
+    pass
+
+
+def ingest_hearing(case_number, hearing_id):
+    meta = fetch_hearing_meta(hearing_id)
+    if not meta or str(meta["case_number"]) != str(case_number):
+        raise HearingNotFound(f"No hearing PDF {hearing_id} found for case {case_number}")
+
+    # The DB's id, so chunk metadata compares equal whatever type the caller passed
+    hearing_id = meta["hearing_id"]
+    version = hearing_version(meta)
+    case_store = VectorStore(case_number=case_number)
+    if case_store.has_hearing(hearing_id, version):
+        case_store.remove_hearing(hearing_id, keep_version=version)
+        return {
+            "message": "Hearing PDF already present in vector database",
+            "case_number": case_number,
+            "hearing_id": hearing_id,
+            "chunks": 0,
+        }
+
+    pdf_bytes = fetch_hearing_pdf(hearing_id)
+    if not pdf_bytes:
+        raise HearingNotFound(f"No hearing PDF {hearing_id} found for case {case_number}")
+
+    # Extract text page by page straight from the blob so chunks can carry their page span
+    pages = extract_pages_from_pdf(pdf_bytes)
+
+    # Chunk, embed and add the document to the case vector database
+    chunk_count = case_store.add_document("".join(pages), hearing_id=hearing_id, pages=pages,
+                                          hearing_version=version)
+    # A re-uploaded hearing replaces the chunks of its earlier versions
+    case_store.remove_hearing(hearing_id, keep_version=version)
+    return {
+        "message": "Hearing PDF successfully added/updated in vector database",
+        "case_number": case_number,
+        "hearing_id": hearing_id,
+        "chunks": chunk_count,
+    }
@@ -1,38 +1,63 @@
-import numpy as np
-import faiss,pickle, os, json
-from services.embedding_model import EmbeddingModel
-import google.generativeai as genai
-from dotenv import load_dotenv
-from collections import defaultdict, deque
-from datetime import datetime
+import os, json, logging, time
+from services.embedding_dispatcher import query_embedder
+from services.vector_store import VectorStore
+from services.case_cache import case_index_cache, case_stamp
+from services.answer_cache import answer_cache
+from services.static_corpus import load_static_index, load_static_chunks
+from services.retrieval import retrieve, hits_by_source, score_summary
+from services.context_builder import build_context, approx_tokens
+from services.conversation_memory import get_memory_backend
+from services.resources import resources
+from services.section_index import load_section_index, parse_section_query
+from utils.llm import get_llm_model
+from utils.metrics import span, STAGE_SECONDS
 import jwt
 
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+logger = logging.getLogger(__name__)
 
-conversation_memory = defaultdict(lambda: defaultdict(lambda: deque(maxlen=10)))
+# Static corpora are loaded on first use (or by /warmup), not at import
+resources.register("supreme_corpus", lambda: (load_static_index("legal22-25.index"), load_static_chunks("chunks22-25")))
+resources.register("ref_corpus", lambda: (load_static_index("ref_emb.index"), load_static_chunks("ref")))
+resources.register("section_index", load_section_index, required=False)
 
-STATIC_PATH = "data/static"
-
-supreme_index = faiss.read_index(os.path.join(f"{STATIC_PATH}/legal22-25.index"))
-with open(os.path.join(f"{STATIC_PATH}/chunks22-25.pkl"), "rb") as f:
-    supreme_chunks = pickle.load(f)
+# Section index source -> resource holding that corpus
+_SECTION_SOURCES = {"law": "ref_corpus", "supreme": "supreme_corpus"}
+    
+CASES_PATH = "data/cases"
 
-ref_index = faiss.read_index(os.path.join(f"{STATIC_PATH}/ref_emb.index"))
-with open(os.path.join(f"{STATIC_PATH}/ref.pkl"), "rb") as f:
-    ref_chunks = pickle.load(f)
+def _load_case_db_from_disk(case_number: str):
+    store = VectorStore(case_number=case_number, base_dir=CASES_PATH, read_only=True)
+    if store.index is None:
+        raise FileNotFoundError(f"No vector store for case {case_number}")
     
+    return store.index, store.chunks
+
 def load_case_db(case_number: str):
-    case_path = f"data/cases/{case_number}"
-    index = faiss.read_index(os.path.join(case_path, "legal.index"))
-    with open(os.path.join(case_path, "chunks.pkl"), "rb") as f:
-        chunks = pickle.load(f)
-    
-    return index, chunks
+    return case_index_cache.get(
+        os.path.join(CASES_PATH, str(case_number)),
+        lambda: _load_case_db_from_disk(case_number),
+    )
+
 
+def lookup_section_hits(citations):
+    if not citations:
+        return []
+    try:
+        index = resources.get("section_index")
+    except Exception as e:
+        logger.warning("section index unavailable", extra={"error": str(e)})
+        return []
+    if index is None:
+        return []
 
-model = EmbeddingModel.get_model()
+    hits = []
+    for source, chunk_id, key in index.lookup(citations):
+        chunks = resources.get(_SECTION_SOURCES[source])[1]
+        # Chunk ids are only meaningful for the corpus the index was built from
+        if index.sources.get(source, {}).get("count", len(chunks)) != len(chunks):
+            continue
+        hits.append({"source": source, "id": chunk_id, "score": 1.0, "text": chunks[chunk_id], "section": key})
+    return hits
 
 def extract_user_from_jwt(auth_header):
     if not auth_header or not auth_header.startswith('Bearer '):
@@ -45,58 +70,79 @@ def extract_user_from_jwt(auth_header):
         session_id = decoded.get('sessionId') or decoded.get('session_id')
         return str(user_id), str(session_id) if session_id else None
     except Exception as e:
-        print(f"JWT decode error: {e}")
+        logger.warning("JWT decode error", extra={"error": str(e)})
         return None, None
 
 def get_conversation_history(user_id, case_number, limit=3):
     if not user_id or not case_number:
         return []
     
-    memory_key = f"{user_id}:{case_number}"
-    if memory_key in conversation_memory:
-        history = list(conversation_memory[user_id][case_number])
-        return history[-limit:] if len(history) > limit else history
-    return []
+    return get_memory_backend().get_recent(str(user_id), str(case_number), limit)
 
 def save_conversation_turn(user_id, case_number, query, response):
     if not user_id or not case_number:
         return
     
-    turn = {
-        "query": query,
-        "response": response[:500],
-        "timestamp": datetime.now().isoformat()
-    }
-    
-    conversation_memory[user_id][case_number].append(turn)
+    get_memory_backend().append(str(user_id), str(case_number), query, response)
 
-def chatbot_response(query, case_number=None, auth_header=None, top_k=10):
+def prepare_chat(query, case_number=None, auth_header=None, top_k=10):
     case_identifier = case_number
     
     user_id, session_id = extract_user_from_jwt(auth_header)
     
-    conversation_history = get_conversation_history(user_id, case_identifier) if user_id and case_identifier else []
-    
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    faiss.normalize_L2(query_embedding)
+    with span("rag.load_memory"):
+        conversation_history = get_conversation_history(user_id, case_identifier) if user_id and case_identifier else []
     
-    supreme_references = []
-    law_references = []
-    case_references = []
+    with span("rag.embed_query"):
+        query_embedding = query_embedder.embed(query)
 
-    D_sup, I_sup = supreme_index.search(query_embedding, top_k//2)
-    supreme_references.extend([supreme_chunks[i] for i in I_sup[0] if i < len(supreme_chunks)])
+    chat = {
+        "query": query,
+        "user_id": user_id,
+        "case_number": case_identifier,
+        "embedding": query_embedding,
+        # Answers that lean on earlier turns are not reusable by anyone else
+        "cacheable": not conversation_history,
+        "cache_case": str(case_identifier) if case_identifier else "",
+        # Taken before retrieval so an answer is never filed under a newer
+        # version of the case, or of the static corpora and section index
+        # (resources.generation moves on every reload), than it was built from
+        "cache_stamp": (
+            resources.generation,
+            case_stamp(os.path.join(CASES_PATH, str(case_identifier))) if case_identifier else None,
+        ),
+    }
+    # A follow-up depends on its history, so it is never answered from the cache
+    if chat["cacheable"]:
+        cached = answer_cache.get(chat["cache_case"], query_embedding, chat["cache_stamp"])
+        if cached is not None:
+            chat["cached"], chat["cache_similarity"] = cached
+            return chat
     
-    D_ref, I_ref = ref_index.search(query_embedding, top_k//2)
-    law_references.extend([ref_chunks[i] for i in I_ref[0] if i < len(ref_chunks)])
-
+    sources = [
+        ("supreme", lambda: resources.get("supreme_corpus")),
+        ("law", lambda: resources.get("ref_corpus")),
+    ]
     if case_identifier:
-        try:
-            index, chunks = load_case_db(case_identifier)
-            D_c, I_c = index.search(query_embedding, top_k//2)
-            case_references.extend([chunks[i] for i in I_c[0] if i < len(chunks)])
-        except Exception as e:
-            print(f"Case data not found for {case_identifier}: {e}")
+        sources.append(("case", lambda: load_case_db(case_identifier)))
+
+    citations, section_only = parse_section_query(query)
+    with span("rag.section_lookup"):
+        exact_hits = lookup_section_hits(citations)
+
+    if section_only and exact_hits:
+        # "Section 302 IPC" and the like: the cited provisions are the answer
+        hits = exact_hits
+    else:
+        with span("rag.retrieve"):
+            hits = retrieve(query_embedding, sources, top_k//2, with_vectors=True)
+        exact = {(hit["source"], hit["id"]) for hit in exact_hits}
+        hits = exact_hits + [hit for hit in hits if (hit["source"], hit["id"]) not in exact]
+    with span("rag.context"):
+        selected, context_stats = build_context(hits)
+    supreme_references = hits_by_source(selected, "supreme")
+    law_references = hits_by_source(selected, "law")
+    case_references = hits_by_source(selected, "case")
 
     conversation_context = ""
     if conversation_history:
@@ -181,18 +227,89 @@ def chatbot_response(query, case_number=None, auth_header=None, top_k=10):
     - Reference previous conversation when relevant (e.g., "As discussed earlier...").
     - Prioritize case-specific documents when available for personalized legal advice.
     """
-        
-    llm_model = genai.GenerativeModel("gemini-2.0-flash")
-    response = llm_model.generate_content(prompt)
 
+    context_stats["prompt_tokens"] = approx_tokens(prompt)
+    logger.info("RAG prompt built", extra=context_stats)
+
+    chat["hits"] = hits
+    chat["prompt"] = prompt
+    return chat
+
+def parse_llm_json(text):
     try:
-        response_json = json.loads(response.text)
+        return json.loads(text)
     except json.JSONDecodeError:
-        cleaned = response.text.strip().strip("```json").strip("```")
-        response_json = json.loads(cleaned)
+        cleaned = text.strip().strip("```json").strip("```")
+        return json.loads(cleaned)
+
+def finish_chat(chat, text):
+    with span("rag.parse"):
+        response_json = parse_llm_json(text)
+    response_json["retrieval"] = score_summary(chat["hits"])
+    if chat["cacheable"]:
+        answer_cache.put(chat["cache_case"], chat["embedding"], response_json, chat["cache_stamp"])
+    response_json["cached"] = False
+
+    remember_turn(chat, response_json)
+    return response_json
+
+def finish_cached_chat(chat):
+    response_json = chat["cached"]
+    response_json["cached"] = True
+    response_json["cache_similarity"] = round(chat["cache_similarity"], 4)
+    remember_turn(chat, response_json)
+    return response_json
 
+def remember_turn(chat, response_json):
+    user_id, case_identifier = chat["user_id"], chat["case_number"]
     if user_id and case_identifier:
         answer_text = " ".join(response_json.get("answer", [])) if isinstance(response_json.get("answer"), list) else str(response_json.get("answer", ""))
-        save_conversation_turn(user_id, case_identifier, query, answer_text)
+        with span("rag.save_memory"):
+            save_conversation_turn(user_id, case_identifier, chat["query"], answer_text)
+
+def chatbot_response(query, case_number=None, auth_header=None, top_k=10):
+    chat = prepare_chat(query, case_number=case_number, auth_header=auth_header, top_k=top_k)
+    if "cached" in chat:
+        return finish_cached_chat(chat)
+    with span("rag.llm"):
+        response = get_llm_model().generate_content(chat["prompt"])
+    return finish_chat(chat, response.text)
+
+def _cancel_stream(response):
+    # Best effort: stop the underlying gRPC/HTTP stream so an abandoned
+    # request does not keep generating tokens
+    iterator = getattr(response, "_iterator", None)
+    cancel = getattr(iterator, "cancel", None) or getattr(iterator, "close", None)
+    if cancel:
+        try:
+            cancel()
+        except Exception as e:
+            logger.warning("failed to cancel LLM stream", extra={"error": str(e)})
+
+def chatbot_response_stream(query, case_number=None, auth_header=None, top_k=10):
+    # Yields ("delta", text) while Gemini streams, then ("result", response_json).
+    # Closing the generator (client disconnected) cancels the LLM stream.
+    chat = prepare_chat(query, case_number=case_number, auth_header=auth_header, top_k=top_k)
+    if "cached" in chat:
+        yield "result", finish_cached_chat(chat)
+        return
+    start = time.perf_counter()
+    response = get_llm_model().generate_content(chat["prompt"], stream=True)
+
+    parts = []
+    finished = False
+    try:
+        for chunk in response:
+            text = chunk.text
+            if text:
+                if not parts:
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage="rag.llm_first_token")
+                parts.append(text)
+                yield "delta", text
+        finished = True
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="rag.llm_stream")
+        if not finished:
+            _cancel_stream(response)
 
-    return response_json
\ No newline at end of file
+    yield "result", finish_chat(chat, "".join(parts))
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Resource:
+    def __init__(self, name, loader, required=True):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.value = None
+        self.loaded = False
+        self.load_seconds = None
+        self.loaded_at = None
+        self.error = None
+        self.lock = threading.Lock()
+
+
+class ResourceRegistry:
+    # Heavy process-wide resources (models, static indexes) are registered
+    # with a loader and only built on first use or an explicit warm-up, so
+    # importing the app stays cheap and each load is timed for /readyz.
+
+    def __init__(self):
+        self._resources = {}
+        # Bumped by every reload, so caches of derived results (the answer
+        # cache) can tell they were built from older resources
+        self.generation = 0
+
+    def register(self, name, loader, required=True):
+        self._resources[name] = Resource(name, loader, required)
+
+    def get(self, name):
+        resource = self._resources[name]
+        if resource.loaded:
+            return resource.value
+        with resource.lock:
+            if not resource.loaded:
+                start = time.perf_counter()
+                try:
+                    resource.value = resource.loader()
+                except Exception as e:
+                    resource.error = str(e)
+                    raise
+                resource.load_seconds = time.perf_counter() - start
+                resource.loaded_at = time.time()
+                resource.error = None
+                resource.loaded = True
+                logger.info("resource loaded", extra={"resource": name, "load_seconds": round(resource.load_seconds, 3)})
+        return resource.value
+
+    def is_loaded(self, name):
+        return self._resources[name].loaded
+
+    def warmup(self, names=None):
+        errors = {}
+        for name in names or list(self._resources):
+            try:
+                self.get(name)
+            except Exception as e:
+                errors[name] = str(e)
+        return errors
+
+    def reload(self, names=None):
+        # Drop the current values and load again, e.g. after the static
+        # indexes were rebuilt; callers holding the old objects keep them
+        for name in names or list(self._resources):
+            resource = self._resources[name]
+            with resource.lock:
+                resource.value = None
+                resource.loaded = False
+                resource.error = None
+        self.generation += 1
+        return self.warmup(names)
+
+    def ready(self):
+        return all(r.loaded for r in self._resources.values() if r.required)
+
+    def status(self):
+        return {
+            name: {
+                "loaded": r.loaded,
+                "required": r.required,
+                "load_seconds": round(r.load_seconds, 3) if r.load_seconds is not None else None,
+                "error": r.error,
+            }
+            for name, r in self._resources.items()
+        }
+
+
+resources = ResourceRegistry()
@@ -0,0 +1,80 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", 0.25))
+RETRIEVAL_THREADS = int(os.getenv("RETRIEVAL_THREADS", 3))
+
+# FAISS releases the GIL while searching, so the static, reference and case
+# searches genuinely overlap and retrieval costs the slowest of them.
+_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+
+
+def _reconstruct(index, i):
+    try:
+        return index.reconstruct(i)
+    except RuntimeError:
+        # e.g. IVF indexes built without a direct map
+        return None
+
+
+def _similarity(index, distances):
+    # Scores are cosine similarities of L2-normalized vectors, higher is
+    # better. An L2 index returns squared distances, which for unit vectors
+    # are 2 - 2*cos.
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    if index.metric_type == faiss.METRIC_L2:
+        return 1.0 - distances / 2.0
+    raise ValueError(f"Unsupported FAISS metric {index.metric_type}; expected inner product or L2")
+
+
+def _search(source, load, query_embedding, k, with_vectors=False):
+    try:
+        with span(f"retrieval.load.{source}"):
+            index, chunks = load()
+    except Exception as e:
+        logger.warning("retrieval source unavailable", extra={"source": source, "error": str(e)})
+        return []
+
+    with span(f"retrieval.search.{source}"):
+        D, I = index.search(query_embedding, k)
+    try:
+        D = _similarity(index, D)
+    except ValueError as e:
+        logger.warning("retrieval source skipped", extra={"source": source, "error": str(e)})
+        return []
+    hits = [
+        {"source": source, "id": int(i), "score": float(d), "text": chunks[i]}
+        for d, i in zip(D[0], I[0])
+        if 0 <= i < len(chunks)
+    ]
+    if with_vectors:
+        for hit in hits:
+            hit["vector"] = _reconstruct(index, hit["id"])
+    return hits
+
+
+def retrieve(query_embedding, sources, k, min_score=RETRIEVAL_MIN_SCORE, with_vectors=False):
+    # sources: list of (name, load) where load() returns (index, chunks)
+    futures = [_executor.submit(_search, name, load, query_embedding, k, with_vectors) for name, load in sources]
+    hits = [hit for future in futures for hit in future.result()]
+    hits = [hit for hit in hits if hit["score"] >= min_score]
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    return hits
+
+
+def hits_by_source(hits, source):
+    return [hit["text"] for hit in hits if hit["source"] == source]
+
+
+def score_summary(hits):
+    return [
+        {"source": hit["source"], "id": hit["id"], "score": round(hit["score"], 4), "used": hit.get("used", True),
+         **({"section": hit["section"]} if "section" in hit else {})}
+        for hit in hits
+    ]
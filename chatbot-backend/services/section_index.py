@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import re
+from collections import Counter
+
+from services.static_corpus import STATIC_PATH
+
+SECTION_INDEX_PATH = os.getenv("SECTION_INDEX_PATH", os.path.join(STATIC_PATH, "sections.json"))
+# Exact-match chunks pulled per cited provision and source
+SECTION_LOOKUP_LIMIT = int(os.getenv("SECTION_LOOKUP_LIMIT", 3))
+
+SECTION_INDEX_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+_ACTS = {
+    # CrPC first so "Cr.P.C." is never read as CPC
+    "CRPC": r"Cr\.?\s?P\.?\s?C\.?|Code\s+of\s+Criminal\s+Procedure|Criminal\s+Procedure\s+Code",
+    "CPC": r"C\.?\s?P\.?\s?C\.?|Code\s+of\s+Civil\s+Procedure|Civil\s+Procedure\s+Code",
+    "IPC": r"I\.?\s?P\.?\s?C\.?|Indian\s+Penal\s+Code|Penal\s+Code",
+}
+# Enactment years, so "IPC, 1860" is not read as section 1860
+_ACT_YEARS = {"IPC": {"1860"}, "CRPC": {"1973", "1898"}, "CPC": {"1908"}}
+
+_ACT = "|".join(f"(?P<{name}>{pattern})" for name, pattern in _ACTS.items())
+_NUM = r"\d{1,4}(?:-?[A-Z]{1,2})?(?![\w-])(?:\s?\(\w{1,4}\))*"
+_NUMS = rf"{_NUM}(?:\s*(?:,|/|&|\band\b|\br/w\b|\bread\s+with\b)\s*{_NUM})*"
+_SECTION_WORD = r"\bsections?\b|\bsecs?\b\.?|\bss?\.|\bu/s\.?"
+
+_SECTION_FIRST = re.compile(
+    rf"(?:{_SECTION_WORD})\s*(?P<nums>{_NUMS})(?:\s*(?:of|under|in)\s+(?:the\s+)?|\s*,?\s*)(?:\b(?:{_ACT})(?![\w]))?",
+    re.IGNORECASE,
+)
+_ACT_FIRST = re.compile(
+    rf"\b(?:{_ACT})(?![\w])\s*,?\s*(?:{_SECTION_WORD})?\s*(?P<nums>{_NUMS})",
+    re.IGNORECASE,
+)
+_ORDER = re.compile(
+    rf"\border\s+(?P<order>[IVXL]+|\d{{1,2}})\b(?:\s*,?\s*(?:\brules?\b|\br\.)\s*(?P<rule>\d{{1,3}}[A-Z]?))?"
+    rf"(?:\s*(?:of\s+(?:the\s+)?|,\s*)?\b(?:{_ACT})(?![\w]))?",
+    re.IGNORECASE,
+)
+_ACT_ONLY = re.compile(rf"\b(?:{_ACT})(?![\w])", re.IGNORECASE)
+# "302. Punishment for murder.—" or "Section 302 —" opening a statute chunk
+_HEADING = re.compile(r"^\s*(?:section\s+)?(?P<num>\d{1,4}[A-Z]{0,2})\s*[.:\-–—]\s+\S", re.IGNORECASE)
+
+_ROMAN = {"I": 1, "V": 5, "X": 10, "L": 50}
+
+# Words that can surround a citation without asking anything beyond it
+_LOOKUP_FILLER = set("""
+    what is are was the of under in section sections sec s u/s r/w read with and or explain define definition meaning
+    provision provisions text say says said tell me about show give please a an for punishment punishable act code
+    order rule rules indian penal criminal civil procedure contents content details detail full bare
+""".split())
+
+
+def _roman(value):
+    if value.isdigit():
+        return int(value)
+    total, previous = 0, 0
+    for ch in reversed(value.upper()):
+        n = _ROMAN[ch]
+        total = total - n if n < previous else total + n
+        previous = max(previous, n)
+    return total
+
+
+def _act_of(match):
+    for name in _ACTS:
+        if match.group(name):
+            return name
+    return None
+
+
+def _section_numbers(nums):
+    for num in re.findall(_NUM, nums, re.IGNORECASE):
+        yield re.sub(r"\(.*", "", num).replace("-", "").strip().upper()
+
+
+def section_key(act, section):
+    return f"{act}:{section}"
+
+
+def _keys(act, numbers):
+    return [section_key(act, n) for n in numbers if n not in _ACT_YEARS.get(act, ())]
+
+
+def _scan(text):
+    # (start, end, act or None, [section numbers]) for every citation-looking span
+    found = []
+    for match in _SECTION_FIRST.finditer(text):
+        act = _act_of(match)
+        found.append((match.start(), match.end(), act, list(_section_numbers(match.group("nums")))))
+    for match in _ACT_FIRST.finditer(text):
+        found.append((match.start(), match.end(), _act_of(match), list(_section_numbers(match.group("nums")))))
+    for match in _ORDER.finditer(text):
+        act = _act_of(match)
+        # A bare "order II" is ordinary English; need CPC or a rule to be sure
+        if act not in (None, "CPC") or (act is None and not match.group("rule")):
+            continue
+        order = f"O{_roman(match.group('order'))}"
+        keys = [order] + ([f"{order}R{match.group('rule').upper()}"] if match.group("rule") else [])
+        found.append((match.start(), match.end(), "CPC", keys))
+    return found
+
+
+def extract_citations(text):
+    found = _scan(text)
+    mentioned = {_act_of(m) for m in _ACT_ONLY.finditer(text)}
+    # A section without its act is only trusted when the text names one act
+    default_act = next(iter(mentioned)) if len(mentioned) == 1 else None
+
+    keys = []
+    for _, _, act, numbers in found:
+        act = act or default_act
+        if not act:
+            continue
+        for key in _keys(act, numbers):
+            if key not in keys:
+                keys.append(key)
+    return keys
+
+
+def parse_section_query(query):
+    # Returns (citation keys, pure) where pure means the query asks for
+    # nothing beyond the cited provisions
+    keys = extract_citations(query)
+    if not keys:
+        return keys, False
+    residue = query
+    for start, end, _, _ in sorted(_scan(query), reverse=True):
+        residue = residue[:start] + " " + residue[end:]
+    residue = _ACT_ONLY.sub(" ", residue)
+    words = [w for w in re.split(r"[^\w/]+", residue.lower()) if w]
+    return keys, all(w in _LOOKUP_FILLER or w.isdigit() for w in words)
+
+
+def heading_keys(chunk, act):
+    # Provisions a statute chunk defines (as opposed to merely mentions)
+    keys = []
+    head = chunk[:160]
+    match = _HEADING.match(head)
+    if match and act:
+        keys.append(section_key(act, match.group("num").upper()))
+    for start, _, cited_act, numbers in _scan(head):
+        if start < 40 and (cited_act or act):
+            keys.extend(_keys(cited_act or act, numbers))
+    return list(dict.fromkeys(keys))
+
+
+def dominant_act(chunk):
+    counts = Counter(_act_of(m) for m in _ACT_ONLY.finditer(chunk))
+    return counts.most_common(1)[0][0] if counts else None
+
+
+class SectionIndex:
+    # act:section -> {source: [chunk ids]} built offline by
+    # scripts/build_section_index.py; chunk ids are positions in the static
+    # corpora, defining chunks listed before chunks that only cite the section
+
+    def __init__(self, postings, sources=None):
+        self.postings = postings
+        self.sources = sources or {}
+
+    @classmethod
+    def load(cls, path=SECTION_INDEX_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SECTION_INDEX_VERSION:
+            raise RuntimeError(f"{path} has version {data.get('version')}, expected {SECTION_INDEX_VERSION}")
+        return cls(data["postings"], data.get("sources"))
+
+    def lookup(self, keys, limit=SECTION_LOOKUP_LIMIT):
+        # [(source, chunk id, key)], in key order then posting order
+        results, seen = [], set()
+        for key in keys:
+            for source, ids in self.postings.get(key, {}).items():
+                for chunk_id in ids[:limit]:
+                    if (source, chunk_id) not in seen:
+                        seen.add((source, chunk_id))
+                        results.append((source, chunk_id, key))
+        return results
+
+    def __len__(self):
+        return len(self.postings)
+
+
+def load_section_index(path=SECTION_INDEX_PATH):
+    if not os.path.exists(path):
+        logger.info("no section index, exact section lookup disabled", extra={"path": path})
+        return None
+    return SectionIndex.load(path)
@@ -0,0 +1,61 @@
+import os, pickle, logging
+import faiss
+from services.chunk_store import MappedChunkStore, chunk_store_exists
+
+logger = logging.getLogger(__name__)
+
+STATIC_PATH = os.getenv("STATIC_PATH", "data/static")
+STATIC_MMAP = os.getenv("STATIC_MMAP", "1").lower() not in ("0", "false", "no")
+
+# flat | ivf | hnsw | ivfpq; variants are built by scripts/build_ann_index.py
+STATIC_INDEX_KIND = os.getenv("STATIC_INDEX_KIND", "flat").lower()
+STATIC_NPROBE = int(os.getenv("STATIC_NPROBE", 16))
+STATIC_EF_SEARCH = int(os.getenv("STATIC_EF_SEARCH", 64))
+
+# Newer FAISS releases can map flat code arrays directly (IO_FLAG_MMAP_IFC);
+# older ones only map inverted lists with IO_FLAG_MMAP.
+MMAP_IO_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def variant_path(path, kind):
+    if kind == "flat":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{kind}{ext}"
+
+
+def _read_index(path, use_mmap):
+    if use_mmap:
+        try:
+            return faiss.read_index(path, MMAP_IO_FLAGS)
+        except RuntimeError as e:
+            logger.warning("mmap load failed, reading index into memory", extra={"path": path, "error": str(e)})
+    return faiss.read_index(path)
+
+
+def load_static_index(filename, static_path=STATIC_PATH, use_mmap=STATIC_MMAP, kind=STATIC_INDEX_KIND,
+                      nprobe=STATIC_NPROBE, ef_search=STATIC_EF_SEARCH):
+    path = os.path.join(static_path, filename)
+    if kind != "flat":
+        candidate = variant_path(path, kind)
+        if os.path.exists(candidate):
+            path = candidate
+        else:
+            logger.warning("index variant missing, using the flat index", extra={"index": filename, "kind": kind})
+            kind = "flat"
+
+    index = _read_index(path, use_mmap)
+    space = faiss.ParameterSpace()
+    if kind in ("ivf", "ivfpq"):
+        space.set_index_parameter(index, "nprobe", nprobe)
+    elif kind == "hnsw":
+        space.set_index_parameter(index, "efSearch", ef_search)
+    return index
+
+
+def load_static_chunks(name, static_path=STATIC_PATH, use_mmap=STATIC_MMAP):
+    prefix = os.path.join(static_path, name)
+    if use_mmap and chunk_store_exists(prefix):
+        return MappedChunkStore(prefix)
+    with open(prefix + ".pkl", "rb") as f:
+        return pickle.load(f)
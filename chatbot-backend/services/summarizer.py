@@ -1,11 +1,84 @@
-import google.generativeai as genai
 import os
 import json
-from dotenv import load_dotenv
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.llm import get_llm_model, response_text
+from utils.metrics import span, STAGE_SECONDS
+from utils.rate_limit import RateLimiter
 
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the prompt or output schema changes so cached summaries
+# produced by the old prompt are not served.
+PROMPT_VERSION = "2"
+
+# Texts longer than SUMMARY_MAP_REDUCE_CHARS are split into sections of about
+# SUMMARY_SECTION_CHARS, each condensed to notes by a concurrent "map" call
+# (at most SUMMARY_MAP_CONCURRENCY in flight), and the notes are reduced into
+# the usual lawyer_view/client_view schema by one final call.
+SUMMARY_MAP_REDUCE_CHARS = int(os.getenv("SUMMARY_MAP_REDUCE_CHARS", 60000))
+SUMMARY_SECTION_CHARS = int(os.getenv("SUMMARY_SECTION_CHARS", 20000))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 4))
+
+# Every summarizer LLM call in the process (single, batch and map-reduce)
+# draws from one token bucket; <= 0 disables it. Per worker process.
+SUMMARY_LLM_RPM = float(os.getenv("SUMMARY_LLM_RPM", 60))
+SUMMARY_LLM_BURST = int(os.getenv("SUMMARY_LLM_BURST", 5))
+
+llm_rate_limiter = RateLimiter(SUMMARY_LLM_RPM, SUMMARY_LLM_BURST)
+
+
+def _throttle():
+    waited = llm_rate_limiter.acquire()
+    if waited:
+        STAGE_SECONDS.observe(waited, stage="summary.rate_limit_wait")
+
+
+def split_sections(text, section_chars=SUMMARY_SECTION_CHARS):
+    sections = []
+    start = 0
+    while start < len(text):
+        end = min(start + section_chars, len(text))
+        if end < len(text):
+            # Prefer to cut at a paragraph, then a line, in the last quarter of the window
+            floor = start + section_chars * 3 // 4
+            cut = text.rfind("\n\n", floor, end)
+            if cut == -1:
+                cut = text.rfind("\n", floor, end)
+            if cut != -1:
+                end = cut + 1
+        section = text[start:end].strip()
+        if section:
+            sections.append(section)
+        start = end
+    return sections
+
+
+def _summarize_section(section, position, total):
+    prompt = f"""
+    You are an expert legal assistant. The text below is section {position} of {total} of a single legal case document.
+    Extract concise, technical notes from this section only. Return plain text bullet points starting with "- ".
+    Preserve every party name, date, case number, statute section, court order, argument, finding and direction.
+    Mention any next hearing date and the procedural status if this section states them.
+    Do not add information that is not in the section.
+
+    SECTION TEXT:
+    {section}
+    """
+    _throttle()
+    start = time.perf_counter()
+    # A failed or blocked section is left out rather than failing the summary
+    try:
+        with span("summary.map"):
+            response = get_llm_model().generate_content(prompt, generation_config={'max_output_tokens': 1500})
+        notes = response_text(response)
+    except Exception as e:
+        logger.warning("summary section failed", extra={"section": position, "sections": total, "error": str(e)})
+        return "", time.perf_counter() - start
+    if not notes.strip():
+        logger.warning("no notes for summary section", extra={"section": position, "sections": total})
+    return notes, time.perf_counter() - start
 
 
 def summarize_text(text, lang):
@@ -13,6 +86,51 @@ def summarize_text(text, lang):
     if text is None or text.strip() == "":
         return {"error": "No text provided for summarization."}
 
+    if len(text) <= SUMMARY_MAP_REDUCE_CHARS:
+        return _summarize_single(text, lang)
+
+    sections = split_sections(text)
+    map_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_MAP_CONCURRENCY)) as executor:
+        results = list(executor.map(
+            lambda item: _summarize_section(item[1], item[0] + 1, len(sections)),
+            enumerate(sections),
+        ))
+    map_wall = time.perf_counter() - map_start
+
+    notes = "\n\n".join(
+        f"Notes from section {i + 1} of {len(sections)}:\n{section_notes.strip()}"
+        for i, (section_notes, _) in enumerate(results)
+        if section_notes.strip()
+    )
+    failed = sum(1 for section_notes, _ in results if not section_notes.strip())
+    if not notes:
+        return {"error": "No section of the document could be summarized."}
+
+    reduce_start = time.perf_counter()
+    summary = _summarize_single(notes, lang, from_notes=True)
+    reduce_seconds = time.perf_counter() - reduce_start
+
+    call_seconds = [seconds for _, seconds in results]
+    stats = {
+        "mode": "map_reduce",
+        "input_chars": len(text),
+        "map_calls": len(sections),
+        "map_failed": failed,
+        "map_concurrency": SUMMARY_MAP_CONCURRENCY,
+        "map_seconds_total": round(sum(call_seconds), 3),
+        "map_seconds_max": round(max(call_seconds), 3),
+        "map_wall_seconds": round(map_wall, 3),
+        "reduce_seconds": round(reduce_seconds, 3),
+    }
+    logger.info("map-reduce summary", extra=stats)
+    if isinstance(summary, dict) and "error" not in summary:
+        summary["summary_stats"] = stats
+    return summary
+
+
+def _summarize_single(text, lang, from_notes=False):
+
     if lang and lang.lower() != "en" and lang.lower() != "english":
         lang_instruction = f"IMPORTANT: The client_view section MUST be written in {lang} language. Translate all client-facing content to {lang}."
         client_header = f"Client View (Simple {lang} Summary)"
@@ -20,12 +138,6 @@ def summarize_text(text, lang):
         lang_instruction = "Write client_view in English."
         client_header = "Client View (Simple English Summary)"
 
-    lang_hint = (
-        f"Translate client-facing sections into {lang}."
-        if lang and lang.lower() not in ["en", "english"]
-        else "Use English for client sections."
-    )
-
     prompt = f"""
     You are an expert legal assistant that creates structured case summaries. 
     Analyze the provided legal case text and return the result ONLY as valid JSON 
@@ -34,6 +146,8 @@ def summarize_text(text, lang):
 
     {lang_instruction}
 
+    {"The case text below consists of section-by-section notes taken from one long case document, in document order. Treat them together as the full case." if from_notes else ""}
+
     CASE TEXT TO ANALYZE:
     {text}
 
@@ -79,88 +193,51 @@ def summarize_text(text, lang):
     10. Ensure the final output is strictly valid JSON as per the schema above, with no additional text or formatting.
     """
 
-    llm_model = genai.GenerativeModel("gemini-2.0-flash")
-    response = llm_model.generate_content(prompt, generation_config={'max_output_tokens': 2000})
-
-    print("=" * 80)
-    print("DEBUG SUMMARIZER: FULL LLM RESPONSE")
-    print("=" * 80)
-    print(f"Response text length: {len(response.text) if response.text else 0}")
-    print("Raw response text:")
-    print("-" * 40)
-    if response.text:
-        # Print the response with line numbers for easier debugging
-        lines = response.text.split('\n')
-        for i, line in enumerate(lines, 1):
-            print(f"{i:3}: {line}")
-    else:
-        print("(Empty response)")
-    print("-" * 40)
-    print(f"Response repr: {repr(response.text)}")
-    print("=" * 80)
+    _throttle()
+    with span("summary.llm", from_notes=from_notes):
+        response = get_llm_model().generate_content(prompt, generation_config={'max_output_tokens': 2000})
+
+    raw = response_text(response)
+    logger.debug("summary LLM response", extra={"response_chars": len(raw), "from_notes": from_notes})
 
     try:
-        summary_json = json.loads(response.text)
-        print("DEBUG SUMMARIZER: ✅ First JSON parse successful")
+        summary_json = json.loads(raw)
     except json.JSONDecodeError as e:
-        print(f"DEBUG SUMMARIZER: ❌ First JSON parse failed: {e}")
-        print(f"Error at character position: {e.pos if hasattr(e, 'pos') else 'unknown'}")
-        if hasattr(e, 'pos') and e.pos and response.text:
-            # Show context around the error position
-            error_pos = e.pos
-            start = max(0, error_pos - 50)
-            end = min(len(response.text), error_pos + 50)
-            print(f"Context around error: ...{response.text[start:end]}...")
-        
-        print(f"DEBUG SUMMARIZER: Attempting to clean response...")
-        
-        # More robust cleaning
-        cleaned = response.text
-        if cleaned:
-            # Remove markdown code blocks
-            cleaned = cleaned.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-            
-            print(f"DEBUG SUMMARIZER: Cleaned text length: {len(cleaned)}")
-            print("Cleaned text:")
-            print("-" * 40)
-            cleaned_lines = cleaned.split('\n')
-            for i, line in enumerate(cleaned_lines, 1):
-                print(f"{i:3}: {line}")
-            print("-" * 40)
-            
-            try:
-                summary_json = json.loads(cleaned)
-                print("DEBUG SUMMARIZER: ✅ Second JSON parse successful")
-            except json.JSONDecodeError as e2:
-                print(f"DEBUG SUMMARIZER: ❌ Second JSON parse failed: {e2}")
-                print(f"Error at character position: {e2.pos if hasattr(e2, 'pos') else 'unknown'}")
-                if hasattr(e2, 'pos') and e2.pos and cleaned:
-                    # Show context around the error position in cleaned text
-                    error_pos = e2.pos
-                    start = max(0, error_pos - 50)
-                    end = min(len(cleaned), error_pos + 50)
-                    print(f"Context around error in cleaned text: ...{cleaned[start:end]}...")
-                
-                print("DEBUG SUMMARIZER: Returning error response")
-                return {
-                    "error": "Failed to parse LLM response as JSON",
-                    "raw_response": response.text,
-                    "cleaned_response": cleaned,
-                    "parse_error": str(e2)
-                }
-        else:
-            print("DEBUG SUMMARIZER: Empty response from LLM")
+        if not raw:
+            logger.warning("empty summary response from LLM")
             return {
                 "error": "Empty response from LLM",
-                "raw_response": response.text
+                "raw_response": raw
+            }
+
+        # Strip markdown code fences the model sometimes wraps JSON in
+        cleaned = raw.strip()
+        if cleaned.startswith("```json"):
+            cleaned = cleaned[7:]
+        if cleaned.startswith("```"):
+            cleaned = cleaned[3:]
+        if cleaned.endswith("```"):
+            cleaned = cleaned[:-3]
+        cleaned = cleaned.strip()
+
+        try:
+            summary_json = json.loads(cleaned)
+        except json.JSONDecodeError as e2:
+            logger.warning(
+                "summary response is not valid JSON",
+                extra={
+                    "response_chars": len(raw),
+                    "error_pos": e2.pos,
+                    "error_context": cleaned[max(0, e2.pos - 50):e2.pos + 50],
+                    "first_error": str(e),
+                },
+            )
+            return {
+                "error": "Failed to parse LLM response as JSON",
+                "raw_response": raw,
+                "cleaned_response": cleaned,
+                "parse_error": str(e2)
             }
+        logger.debug("summary JSON parsed after stripping code fences")
 
-    print("DEBUG SUMMARIZER: ✅ Returning parsed JSON")
-    return summary_json
\ No newline at end of file
+    return summary_json
@@ -0,0 +1,118 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from services.summarizer import summarize_text, PROMPT_VERSION
+from services.summary_cache import summary_cache, pdf_digest
+from utils.db import fetch_latest_hearing_meta_many, iter_hearing_pdfs
+from utils.metrics import span
+from utils.text_processing import submit_text_extraction
+
+SUMMARY_BATCH_MAX_CASES = int(os.getenv("SUMMARY_BATCH_MAX_CASES", 100))
+# Cache misses summarized at once per batch request; the summarizer's
+# SUMMARY_LLM_RPM limiter still applies across all of them
+SUMMARY_BATCH_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", 4))
+
+logger = logging.getLogger(__name__)
+
+
+def summary_language(meta, requested=None):
+    # Same precedence as getSummary: the client's stored language, then the
+    # requested one, then English
+    db_language = meta.get("language")
+    if db_language and db_language.strip():
+        return db_language
+    return requested or "en"
+
+
+def _result(case_number, status, **fields):
+    return {"case_number": case_number, "status": status, **fields}
+
+
+def summarize_cases(case_numbers, lang=None, concurrency=SUMMARY_BATCH_CONCURRENCY):
+    # Yields one result dict per case as soon as it is known: not-found and
+    # cached cases first, then summaries in completion order, then a final
+    # {"status": "done"} record. Closing the generator cancels pending work.
+    start = time.perf_counter()
+    counts = {"ok": 0, "cached": 0, "not_found": 0, "error": 0}
+
+    def emit(result):
+        counts[result["status"]] += 1
+        if result.get("cached"):
+            counts["cached"] += 1
+        return result
+
+    with span("summary.batch.meta"):
+        metas = fetch_latest_hearing_meta_many(case_numbers)
+
+    misses = {}
+    for case_number in case_numbers:
+        meta = metas.get(case_number)
+        if not meta:
+            yield emit(_result(case_number, "not_found", error="No hearing PDF found for this case_number"))
+            continue
+        case_lang = summary_language(meta, lang)
+        known_digest = summary_cache.digest_for_hearing(meta)
+        if known_digest:
+            cached = summary_cache.get(summary_cache.make_key(known_digest, case_lang, PROMPT_VERSION))
+            if cached is not None:
+                yield emit(_result(case_number, "ok", cached=True, summary=cached))
+                continue
+        misses[meta["hearing_id"]] = (case_number, meta, case_lang, known_digest)
+
+    llm = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="summary-batch")
+    pending = {}
+
+    def summarize(text, case_lang):
+        with span("summary.summarize", chars=len(text)):
+            return summarize_text(text, case_lang)
+
+    try:
+        # Blobs arrive a few per query; each is handed to the extraction pool
+        # as soon as it arrives, so extraction overlaps the transfer
+        for hearing_id, pdf_bytes in iter_hearing_pdfs(list(misses)):
+            if hearing_id not in misses:
+                continue
+            case_number, meta, case_lang, known_digest = misses.pop(hearing_id)
+            if not pdf_bytes:
+                yield emit(_result(case_number, "not_found", error="No hearing PDF found for this case_number"))
+                continue
+            digest = pdf_digest(pdf_bytes)
+            cache_key = summary_cache.make_key(digest, case_lang, PROMPT_VERSION)
+            if digest != known_digest:
+                summary_cache.remember_hearing_digest(meta, digest)
+                cached = summary_cache.get(cache_key)
+                if cached is not None:
+                    yield emit(_result(case_number, "ok", cached=True, summary=cached))
+                    continue
+            pending[submit_text_extraction(pdf_bytes)] = ("extract", case_number, case_lang, digest, cache_key)
+
+        # Hearings deleted since the metadata query
+        for case_number, _, _, _ in misses.values():
+            yield emit(_result(case_number, "not_found", error="No hearing PDF found for this case_number"))
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, case_number, case_lang, digest, cache_key = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    logger.warning("batch summary failed", extra={"case_number": case_number, "stage": stage, "error": str(e)})
+                    yield emit(_result(case_number, "error", error=str(e)))
+                    continue
+
+                if stage == "extract":
+                    pending[llm.submit(summarize, value, case_lang)] = ("summarize", case_number, case_lang, digest, cache_key)
+                elif "error" in value:
+                    yield emit(_result(case_number, "error", error=value["error"], summary=value))
+                else:
+                    summary_cache.put(cache_key, digest, case_lang, PROMPT_VERSION, value)
+                    yield emit(_result(case_number, "ok", cached=False, summary=value))
+    finally:
+        for future in pending:
+            future.cancel()
+        llm.shutdown(wait=False, cancel_futures=True)
+
+    yield {"status": "done", "cases": len(case_numbers), **counts, "seconds": round(time.perf_counter() - start, 3)}
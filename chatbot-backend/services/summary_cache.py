@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "data/summary_cache.sqlite3")
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 10000))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    cache_key TEXT PRIMARY KEY,
+    pdf_sha256 TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_last_access ON summaries (last_access);
+CREATE TABLE IF NOT EXISTS hearing_digests (
+    hearing_id INTEGER PRIMARY KEY,
+    version TEXT NOT NULL,
+    pdf_sha256 TEXT NOT NULL
+);
+"""
+
+
+def pdf_digest(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def hearing_version(meta):
+    # updated_at changes whenever the row (and so the PDF) is rewritten
+    updated_at = meta.get("updated_at") or meta.get("created_at")
+    stamp = updated_at.isoformat() if hasattr(updated_at, "isoformat") else str(updated_at)
+    return f"{stamp}:{meta.get('size')}"
+
+
+def normalize_lang(lang):
+    lang = (lang or "en").strip().lower()
+    return "en" if lang == "english" else lang
+
+
+class SummaryCache:
+    # Summaries keyed by the content hash of the hearing PDF plus target
+    # language and prompt version, so a new upload (different bytes) or a
+    # prompt change misses naturally. Least recently read rows are evicted
+    # once the cache exceeds max_bytes or max_entries.
+
+    def __init__(self, path=SUMMARY_CACHE_PATH, max_bytes=SUMMARY_CACHE_MAX_BYTES,
+                 max_entries=SUMMARY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(digest, lang, prompt_version):
+        raw = f"{digest}\0{normalize_lang(lang)}\0{prompt_version}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT summary FROM summaries WHERE cache_key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        with conn:
+            conn.execute("UPDATE summaries SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, digest, lang, prompt_version, summary):
+        conn = self._connect()
+        payload = json.dumps(summary, ensure_ascii=False)
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, digest, normalize_lang(lang), prompt_version, payload, len(payload.encode("utf-8")), now, now),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        excess_rows = max(0, count - self.max_entries)
+        excess_bytes = max(0, total - self.max_bytes)
+        removed_rows = removed_bytes = 0
+        victims = []
+        for key, size in conn.execute("SELECT cache_key, size FROM summaries ORDER BY last_access ASC"):
+            if removed_rows >= excess_rows and removed_bytes >= excess_bytes:
+                break
+            victims.append((key,))
+            removed_rows += 1
+            removed_bytes += size
+        conn.executemany("DELETE FROM summaries WHERE cache_key = ?", victims)
+
+    def digest_for_hearing(self, meta):
+        # Content hash recorded the last time this hearing version was fetched,
+        # letting a hit skip the blob download entirely
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT pdf_sha256 FROM hearing_digests WHERE hearing_id = ? AND version = ?",
+            (meta["hearing_id"], hearing_version(meta)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def remember_hearing_digest(self, meta, digest):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO hearing_digests VALUES (?, ?, ?)",
+                (meta["hearing_id"], hearing_version(meta), digest),
+            )
+
+    def stats(self):
+        conn = self._connect()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        return {
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+summary_cache = SummaryCache()
@@ -1,44 +1,353 @@
 import numpy as np
 from services.embedding_model import EmbeddingModel
-import os, pickle, faiss
+from services.case_cache import case_index_cache
+from utils.metrics import timed
+from utils.text_processing import chunk_pages, CHUNK_TOKENS, CHUNK_OVERLAP
+import os, json, pickle, faiss
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+
+# Fold the raw vector tail into a fresh base index once it holds at least
+# COMPACT_MIN_TAIL chunks and is COMPACT_RATIO times the size of the base.
+COMPACT_MIN_TAIL = int(os.getenv("CASE_COMPACT_MIN_TAIL", 512))
+COMPACT_RATIO = float(os.getenv("CASE_COMPACT_RATIO", 0.5))
+
+MANIFEST_VERSION = 1
+
+# On-disk layout of a case directory:
+#   manifest.json     committed lengths; replaced atomically via rename
+#   chunks.log        append-only JSON lines {"text": ..., "meta": ...}
+#   chunks.off        append-only int64 start offset of each record in chunks.log
+#                     (chunks-<gen>.log/.off once chunks have been removed; the
+#                     manifest names the pair in use)
+#   base-<gen>.index  FAISS index covering the first base_count chunks
+#   tail-<gen>.vec    append-only float32 vectors for chunks after base_count
+# Anything past the lengths recorded in the manifest is an uncommitted (torn)
+# write and is truncated before the next append.
+
+
+def _fsync_dir(path):
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _append_bytes(path, committed_size, data):
+    with open(path, "ab") as f:
+        f.truncate(committed_size)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+@timed("ingest.chunk")
+def chunk_document(pages, hearing_id=None, hearing_version=None, chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    model = EmbeddingModel.get_model()
+
+    # Leave room for [CLS]/[SEP] so no chunk gets truncated by the encoder
+    max_tokens = (model.max_seq_length or chunk_tokens + 2) - 2
+    chunk_tokens = min(chunk_tokens, max_tokens)
+    overlap = min(overlap, chunk_tokens - 1)
+
+    chunks = chunk_pages(pages, model.tokenizer, chunk_tokens, overlap)
+    texts = [c["text"] for c in chunks]
+    metas = [
+        {
+            "hearing_id": hearing_id,
+            "hearing_version": hearing_version,
+            "chunk_no": i,
+            "page_start": c["page_start"],
+            "page_end": c["page_end"],
+            "char_start": c["char_start"],
+            "char_end": c["char_end"],
+        }
+        for i, c in enumerate(chunks)
+    ]
+    return texts, metas
+
+
+@timed("ingest.embed")
+def embed_texts(texts, batch_size=EMBED_BATCH_SIZE):
+    model = EmbeddingModel.get_model()
+    embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
 
 class VectorStore:
-    def __init__(self, index_file=None, chunks_file=None, base_dir="data/cases", case_number=None, case_id=None):
+    def __init__(self, index_file=None, chunks_file=None, base_dir="data/cases", case_number=None, case_id=None,
+                 read_only=False):
         # Support both case_number and case_id for backward compatibility
         case_identifier = case_number or case_id
+        self.case_number = str(case_identifier) if case_identifier else None
         if case_identifier:
             self.base_dir = os.path.join(base_dir, str(case_identifier))
-            os.makedirs(self.base_dir, exist_ok=True)
             self.index_file = os.path.join(self.base_dir, "legal.index")
             self.chunks_file = os.path.join(self.base_dir, "chunks.pkl")
         else:
+            self.base_dir = os.path.dirname(index_file)
             self.index_file = index_file
             self.chunks_file = chunks_file
 
+        self.manifest_file = os.path.join(self.base_dir, "manifest.json")
+        self.log_file = os.path.join(self.base_dir, "chunks.log")
+        self.off_file = os.path.join(self.base_dir, "chunks.off")
+
+        self.index = None
+        self.chunks = []
+        self.chunk_meta = []
+        self.manifest = None
+        self._pending = []
+        # Readers (the chat path) hold no case lock, so they must never write;
+        # a legacy store is then read as-is and migrated by the next ingest
+        # job or reindex, which run under the case's ingest queue lock
+        self.read_only = read_only
+
+        if os.path.exists(self.manifest_file):
+            self._load()
+        elif self.index_file and os.path.exists(self.index_file):
+            self._read_legacy()
+            if not read_only:
+                self._migrate_legacy()
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"Vector store {self.base_dir} was opened read-only")
+
+    def _base_file(self, generation):
+        return os.path.join(self.base_dir, f"base-{generation}.index")
+
+    def _tail_file(self, generation):
+        return os.path.join(self.base_dir, f"tail-{generation}.vec")
+
+    @timed("vectorstore.load")
+    def _load(self):
+        with open(self.manifest_file) as f:
+            manifest = json.load(f)
+
+        count, dim = manifest["count"], manifest["dim"]
+        log_bytes = manifest["log_bytes"]
+
+        self.log_file = os.path.join(self.base_dir, manifest.get("log_file", "chunks.log"))
+        self.off_file = os.path.join(self.base_dir, manifest.get("off_file", "chunks.off"))
+
+        offsets = np.fromfile(self.off_file, dtype=np.int64, count=count) if count else np.empty(0, dtype=np.int64)
+        with open(self.log_file, "rb") as f:
+            data = f.read(log_bytes)
+        if len(offsets) != count or len(data) != log_bytes:
+            raise RuntimeError(f"Chunk log in {self.base_dir} is shorter than its manifest")
+
+        bounds = offsets.tolist() + [log_bytes]
+        for i in range(count):
+            record = json.loads(data[bounds[i]:bounds[i + 1]])
+            self.chunks.append(record["text"])
+            self.chunk_meta.append(record.get("meta") or {})
+
+        generation, base_count = manifest["generation"], manifest["base_count"]
+        if base_count:
+            self.index = faiss.read_index(self._base_file(generation))
+        else:
+            self.index = faiss.IndexFlatIP(dim)
+
+        tail_count = count - base_count
+        if tail_count:
+            tail = np.fromfile(self._tail_file(generation), dtype=np.float32, count=tail_count * dim)
+            if tail.size != tail_count * dim:
+                raise RuntimeError(f"Vector tail in {self.base_dir} is shorter than its manifest")
+            self.index.add(tail.reshape(tail_count, dim))
+
+        if self.index.ntotal != count:
+            raise RuntimeError(f"Index in {self.base_dir} has {self.index.ntotal} vectors, manifest expects {count}")
+        self.manifest = manifest
+
+    def _read_legacy(self):
+        # Pre-manifest stores kept everything in legal.index + chunks.pkl
+        index = faiss.read_index(self.index_file)
+        with open(self.chunks_file, "rb") as f:
+            chunks = pickle.load(f)
+        meta_file = os.path.splitext(self.chunks_file)[0] + ".meta.pkl"
         try:
-            self.index = faiss.read_index(self.index_file)
-            with open(self.chunks_file, "rb") as f:
-                self.chunks = pickle.load(f)
-        except:
-            self.index = None
-            self.chunks = []
+            with open(meta_file, "rb") as f:
+                chunk_meta = pickle.load(f)
+        except FileNotFoundError:
+            chunk_meta = []
+        if len(chunk_meta) != len(chunks):
+            chunk_meta = [{} for _ in chunks]
+
+        self.index = index
+        self.chunks = list(chunks)
+        self.chunk_meta = list(chunk_meta)
+
+    def _migrate_legacy(self):
+        self.compact(log_bytes=self._write_log(self.chunks, self.chunk_meta))
+
+        meta_file = os.path.splitext(self.chunks_file)[0] + ".meta.pkl"
+        for path in (self.index_file, self.chunks_file, meta_file):
+            if os.path.exists(path):
+                os.remove(path)
 
+    def _commit(self, manifest):
+        tmp = self.manifest_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_file)
+        _fsync_dir(self.base_dir)
+        self.manifest = manifest
+        case_index_cache.invalidate(self.base_dir)
+
+    def _write_log(self, texts, metas, fresh=False):
+        committed_log = self.manifest["log_bytes"] if self.manifest and not fresh else 0
+        committed_count = self.manifest["count"] if self.manifest and not fresh else 0
+
+        records = []
+        offsets = []
+        position = committed_log
+        for text, meta in zip(texts, metas):
+            record = (json.dumps({"text": text, "meta": meta}, ensure_ascii=False) + "\n").encode("utf-8")
+            offsets.append(position)
+            records.append(record)
+            position += len(record)
+
+        _append_bytes(self.log_file, committed_log, b"".join(records))
+        _append_bytes(self.off_file, committed_count * 8, np.asarray(offsets, dtype=np.int64).tobytes())
+        return position
+
+    @timed("vectorstore.save")
     def save(self):
-        if self.index is not None:
-            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
-            faiss.write_index(self.index, self.index_file)
-            with open(self.chunks_file, "wb") as f:
-                pickle.dump(self.chunks, f)
+        if self.index is None or not self._pending:
+            return
+        self._check_writable()
+        os.makedirs(self.base_dir, exist_ok=True)
+
+        if self.manifest is None:
+            self._commit({
+                "version": MANIFEST_VERSION,
+                "generation": 0,
+                "dim": self.index.d,
+                "count": 0,
+                "base_count": 0,
+                "log_bytes": 0,
+            })
+
+        manifest = dict(self.manifest)
+        generation, dim = manifest["generation"], manifest["dim"]
+        tail_committed = (manifest["count"] - manifest["base_count"]) * dim * 4
+
+        texts = [text for batch, _, _ in self._pending for text in batch]
+        metas = [meta for _, batch, _ in self._pending for meta in batch]
+        vectors = np.concatenate([v for _, _, v in self._pending]).astype(np.float32, copy=False)
+        log_bytes = self._write_log(texts, metas)
+        _append_bytes(self._tail_file(generation), tail_committed, vectors.tobytes())
+
+        manifest["count"] += len(texts)
+        manifest["log_bytes"] = log_bytes
+        self._commit(manifest)
+        self._pending = []
+
+        tail_count = manifest["count"] - manifest["base_count"]
+        if tail_count >= COMPACT_MIN_TAIL and tail_count >= COMPACT_RATIO * manifest["base_count"]:
+            self.compact()
+
+    @timed("vectorstore.compact")
+    def compact(self, log_bytes=None):
+        if self.index is None or self._pending:
+            return
+        self._check_writable()
+        os.makedirs(self.base_dir, exist_ok=True)
+        old_generation = self.manifest["generation"] if self.manifest else None
+        generation = (old_generation or 0) + 1
+
+        base_file = self._base_file(generation)
+        faiss.write_index(self.index, base_file + ".tmp")
+        with open(base_file + ".tmp", "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(base_file + ".tmp", base_file)
+        open(self._tail_file(generation), "wb").close()
+
+        if log_bytes is None:
+            log_bytes = self.manifest["log_bytes"] if self.manifest else 0
+        old_logs = {self.manifest.get("log_file", "chunks.log"), self.manifest.get("off_file", "chunks.off")} if self.manifest else set()
+        self._commit({
+            "version": MANIFEST_VERSION,
+            "generation": generation,
+            "dim": self.index.d,
+            "count": self.index.ntotal,
+            "base_count": self.index.ntotal,
+            "log_bytes": log_bytes,
+            "log_file": os.path.basename(self.log_file),
+            "off_file": os.path.basename(self.off_file),
+        })
+
+        stale = old_logs - {os.path.basename(self.log_file), os.path.basename(self.off_file)}
+        if old_generation is not None:
+            stale |= {os.path.basename(self._base_file(old_generation)), os.path.basename(self._tail_file(old_generation))}
+        for name in stale:
+            path = os.path.join(self.base_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    @timed("vectorstore.remove_hearing")
+    def remove_hearing(self, hearing_id, keep_version=None):
+        # Drops the hearing's chunks, except those of keep_version, by writing
+        # the remaining chunks to a fresh log and base index under the next
+        # generation; the manifest commit switches over atomically.
+        if self.index is None or self._pending:
+            return 0
+        keep = [i for i, meta in enumerate(self.chunk_meta)
+                if meta.get("hearing_id") != hearing_id or (keep_version is not None and meta.get("hearing_version") == keep_version)]
+        removed = len(self.chunks) - len(keep)
+        if not removed:
+            return 0
+        self._check_writable()
+
+        texts = [self.chunks[i] for i in keep]
+        metas = [self.chunk_meta[i] for i in keep]
+        try:
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)[keep]
+        except RuntimeError:
+            # Indexes that do not store their vectors (e.g. migrated legacy ones)
+            vectors = embed_texts(texts) if texts else np.empty((0, self.index.d), dtype=np.float32)
+        index = faiss.IndexFlatIP(self.index.d)
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+        generation = (self.manifest["generation"] if self.manifest else 0) + 1
+        self.log_file = os.path.join(self.base_dir, f"chunks-{generation}.log")
+        self.off_file = os.path.join(self.base_dir, f"chunks-{generation}.off")
+        log_bytes = self._write_log(texts, metas, fresh=True)
+        self.index, self.chunks, self.chunk_meta = index, texts, metas
+        self.compact(log_bytes=log_bytes)
+        return removed
+
+    def has_hearing(self, hearing_id, hearing_version=None):
+        for meta in self.chunk_meta:
+            if meta.get("hearing_id") == hearing_id and (hearing_version is None or meta.get("hearing_version") == hearing_version):
+                return True
+        return False
+
+    def add_document(self, text, hearing_id=None, pages=None, batch_size=EMBED_BATCH_SIZE,
+                     chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP, hearing_version=None):
+        texts, metas = chunk_document(pages if pages is not None else [text], hearing_id=hearing_id,
+                                      hearing_version=hearing_version, chunk_tokens=chunk_tokens, overlap=overlap)
+        if not texts:
+            return 0
 
-    def add_document(self, text):
-        model = EmbeddingModel.get_model()
-        embedding = model.encode([text], convert_to_numpy=True)
-        faiss.normalize_L2(embedding)
+        self.add_chunks(texts, metas, embed_texts(texts, batch_size=batch_size))
+        self.save()
+        return len(texts)
 
+    def add_chunks(self, texts, metas, embeddings):
         if self.index is None:
-            dim = embedding.shape[1]
+            dim = embeddings.shape[1]
             self.index = faiss.IndexFlatIP(dim)
 
-        self.index.add(embedding)
-        self.chunks.append(text)
-        self.save()
\ No newline at end of file
+        self.index.add(embeddings)
+        self.chunks.extend(texts)
+        self.chunk_meta.extend(metas)
+        self._pending.append((texts, metas, embeddings))
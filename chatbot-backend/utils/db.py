@@ -1,8 +1,10 @@
 import os
-from typing import Optional, Tuple
+import threading
+import time
+from typing import Optional
 from dotenv import load_dotenv
-import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from utils.metrics import span, timed
 
 load_dotenv()
 
@@ -12,36 +14,192 @@ USER = os.getenv("DB_USER") or os.getenv("MYSQLUSER")
 PASSWORD = os.getenv("DB_PASSWORD") or os.getenv("MYSQLPASSWORD")
 DATABASE = os.getenv("DB_NAME") or os.getenv("MYSQLDATABASE")
 
-def get_mysql_connection():
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# Hearing PDFs fetched per query by iter_hearing_pdfs and iter_hearings
+DB_BLOB_BATCH = int(os.getenv("DB_BLOB_BATCH", 8))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _check_credentials():
     if not all([HOST, USER, PASSWORD, DATABASE]):
         raise RuntimeError(
             "Missing DB credentials. Ensure DB_HOST/USER/PASSWORD/NAME or Railway MYSQL* env vars are set."
         )
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Sockets must not be shared with a forked parent, so each process builds its own pool
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = pooling.MySQLConnectionPool(
+                pool_name=f"nyayasetu_{os.getpid()}",
+                pool_size=DB_POOL_SIZE,
+                pool_reset_session=True,
+                host=HOST,
+                port=PORT,
+                user=USER,
+                password=PASSWORD,
+                database=DATABASE,
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+def get_mysql_connection():
+    _check_credentials()
+    with span("db.checkout"):
+        return _checkout()
+
+def _checkout():
+    deadline = time.monotonic() + DB_POOL_TIMEOUT
+    while True:
+        try:
+            conn = _get_pool().get_connection()
+            break
+        except pooling.PoolError:
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"MySQL connection pool exhausted ({DB_POOL_SIZE} connections busy)")
+            time.sleep(0.05)
+        except Error as e:
+            raise RuntimeError(f"MySQL connection failed: {e}")
+
+    # Health check: reconnect pooled connections the server has dropped
     try:
-        conn = mysql.connector.connect(
-            host=HOST,
-            port=PORT,
-            user=USER,
-            password=PASSWORD,
-            database=DATABASE,
-        )
-        return conn
+        conn.ping(reconnect=True, attempts=2, delay=0)
     except Error as e:
+        conn.close()
         raise RuntimeError(f"MySQL connection failed: {e}")
+    return conn
 
-def fetch_latest_hearing_pdf_by_case_number(case_number: str) -> Optional[Tuple[bytes, str]]:
-    query = """SELECT ch.hearing_pdf, c.language FROM case_hearings ch JOIN cases ca ON ch.case_number = ca.case_number JOIN 
-            clients c ON ca.client_id = c.client_id WHERE ch.case_number = %s ORDER BY ch.created_at DESC LIMIT 1;"""
+@timed("db.latest_hearing_meta")
+def fetch_latest_hearing_meta(case_number: str) -> Optional[dict]:
+    # Everything callers need to decide whether a hearing is already
+    # processed, without transferring the LONGBLOB itself
+    query = """SELECT ch.hearing_id, ch.case_number, ch.hearing_name, ch.created_at, ch.updated_at,
+            OCTET_LENGTH(ch.hearing_pdf) AS size, c.language FROM case_hearings ch JOIN cases ca ON ch.case_number = ca.case_number JOIN 
+            clients c ON ca.client_id = c.client_id WHERE ch.case_number = %s ORDER BY ch.created_at DESC, ch.hearing_id DESC LIMIT 1;"""
     conn = None
     try:
         conn = get_mysql_connection()
-        with conn.cursor() as cur:
+        with conn.cursor(dictionary=True) as cur:
             cur.execute(query, (case_number,))
+            return cur.fetchone()
+    finally:
+        if conn:
+            conn.close()
+
+@timed("db.hearing_meta")
+def fetch_hearing_meta(hearing_id: int) -> Optional[dict]:
+    query = """SELECT ch.hearing_id, ch.case_number, ch.hearing_name, ch.created_at, ch.updated_at,
+            OCTET_LENGTH(ch.hearing_pdf) AS size, c.language FROM case_hearings ch JOIN cases ca ON ch.case_number = ca.case_number JOIN 
+            clients c ON ca.client_id = c.client_id WHERE ch.hearing_id = %s;"""
+    conn = None
+    try:
+        conn = get_mysql_connection()
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(query, (hearing_id,))
+            return cur.fetchone()
+    finally:
+        if conn:
+            conn.close()
+
+@timed("db.hearing_pdf")
+def fetch_hearing_pdf(hearing_id: int) -> Optional[bytes]:
+    query = "SELECT hearing_pdf FROM case_hearings WHERE hearing_id = %s;"
+    conn = None
+    try:
+        conn = get_mysql_connection()
+        with conn.cursor() as cur:
+            cur.execute(query, (hearing_id,))
             row = cur.fetchone()
-            if row:
-                hearing_pdf, language = row
-                return hearing_pdf, language
-            return None
+            return row[0] if row else None
+    finally:
+        if conn:
+            conn.close()
+
+@timed("db.latest_hearing_meta_many")
+def fetch_latest_hearing_meta_many(case_numbers: list) -> dict:
+    # fetch_latest_hearing_meta for many cases in one round trip:
+    # {case_number: meta} for every case that has a hearing
+    if not case_numbers:
+        return {}
+    placeholders = ", ".join(["%s"] * len(case_numbers))
+    query = f"""SELECT hearing_id, case_number, hearing_name, created_at, updated_at, size, language FROM (
+            SELECT ch.hearing_id, ch.case_number, ch.hearing_name, ch.created_at, ch.updated_at,
+            OCTET_LENGTH(ch.hearing_pdf) AS size, c.language,
+            ROW_NUMBER() OVER (PARTITION BY ch.case_number ORDER BY ch.created_at DESC, ch.hearing_id DESC) AS rn
+            FROM case_hearings ch JOIN cases ca ON ch.case_number = ca.case_number JOIN
+            clients c ON ca.client_id = c.client_id WHERE ch.case_number IN ({placeholders})) latest WHERE rn = 1;"""
+    conn = None
+    try:
+        conn = get_mysql_connection()
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(query, tuple(case_numbers))
+            return {str(row["case_number"]): row for row in cur.fetchall()}
+    finally:
+        if conn:
+            conn.close()
+
+def iter_hearing_pdfs(hearing_ids: list, batch_size: int = DB_BLOB_BATCH):
+    # (hearing_id, pdf bytes) for many hearings, batch_size blobs per query.
+    # Each batch is read in full before any row is yielded, so a consumer
+    # that stops early (e.g. a disconnected stream) never leaves unread rows
+    # on the pooled connection, and the server is not kept waiting mid-result.
+    if not hearing_ids:
+        return
+    conn = None
+    try:
+        conn = get_mysql_connection()
+        for start in range(0, len(hearing_ids), batch_size):
+            batch = hearing_ids[start:start + batch_size]
+            query = f"SELECT hearing_id, hearing_pdf FROM case_hearings WHERE hearing_id IN ({', '.join(['%s'] * len(batch))});"
+            with conn.cursor() as cur:
+                cur.execute(query, tuple(batch))
+                rows = cur.fetchall()
+            yield from rows
+    finally:
+        if conn:
+            conn.close()
+
+def iter_hearings(after_case_number: Optional[str] = None, case_numbers: Optional[list] = None,
+                  batch_size: int = DB_BLOB_BATCH):
+    # Streams every hearing, PDF included, ordered by case, batch_size rows
+    # per buffered keyset query: only one batch of blobs is held client-side,
+    # and a consumer that stops early leaves no unread rows on the connection.
+    conditions, params = [], []
+    if after_case_number is not None:
+        conditions.append("case_number > %s")
+        params.append(after_case_number)
+    if case_numbers:
+        conditions.append(f"case_number IN ({', '.join(['%s'] * len(case_numbers))})")
+        params.extend(case_numbers)
+
+    conn = None
+    last = None
+    try:
+        conn = get_mysql_connection()
+        while True:
+            page_conditions, page_params = list(conditions), list(params)
+            if last is not None:
+                page_conditions.append("(case_number, created_at, hearing_id) > (%s, %s, %s)")
+                page_params.extend(last)
+            query = """SELECT hearing_id, case_number, created_at, updated_at, OCTET_LENGTH(hearing_pdf) AS size, hearing_pdf
+                    FROM case_hearings"""
+            if page_conditions:
+                query += " WHERE " + " AND ".join(page_conditions)
+            query += " ORDER BY case_number, created_at, hearing_id LIMIT %s;"
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(query, tuple(page_params) + (batch_size,))
+                rows = cur.fetchall()
+            if not rows:
+                return
+            last = (rows[-1]["case_number"], rows[-1]["created_at"], rows[-1]["hearing_id"])
+            yield from rows
+            if len(rows) < batch_size:
+                return
     finally:
         if conn:
             conn.close()
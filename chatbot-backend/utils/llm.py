@@ -0,0 +1,28 @@
+import os
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+load_dotenv()
+API_KEY = os.getenv("GEMINI_API_KEY")
+genai.configure(api_key=API_KEY)
+
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gemini-2.0-flash")
+
+_llm_model = None
+
+
+def get_llm_model():
+    # One Gemini client per process, shared by chat and summaries
+    global _llm_model
+    if _llm_model is None:
+        _llm_model = genai.GenerativeModel(LLM_MODEL_NAME)
+    return _llm_model
+
+
+def response_text(response):
+    # response.text raises ValueError when the candidate was blocked or empty
+    try:
+        return response.text or ""
+    except ValueError:
+        return ""
@@ -0,0 +1,32 @@
+import threading
+import time
+
+
+class RateLimiter:
+    # Token bucket shared by every thread in the process: up to `burst` calls
+    # at once, refilled at per_minute / 60 calls per second. per_minute <= 0
+    # disables limiting.
+
+    def __init__(self, per_minute, burst=1):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.per_minute <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
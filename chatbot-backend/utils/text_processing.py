@@ -1,8 +1,156 @@
 import fitz
+import multiprocessing
+import os
+import re
+import threading
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from utils.metrics import timed
 
-def extract_text_from_pdf(file_path):
-    doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
\ No newline at end of file
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 256))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 32))
+
+# Documents with at least this many pages are split by page range across a
+# process pool; smaller ones are cheaper to extract inline.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 48))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+# The pool is created from a process running dispatcher, ingest, retrieval and
+# torch/OpenMP threads, where fork() can copy a held lock and deadlock the
+# child; workers are started from a clean forkserver (or spawn) instead.
+PDF_POOL_START_METHOD = os.getenv(
+    "PDF_POOL_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+
+_WORD_RE = re.compile(r"\S+")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _open_pdf(source):
+    # Accepts raw PDF bytes (e.g. a LONGBLOB from MySQL) or a file path
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def pdf_pool_context():
+    context = multiprocessing.get_context(PDF_POOL_START_METHOD)
+    if PDF_POOL_START_METHOD == "forkserver":
+        # The server only needs this module; by default it would also import
+        # the parent's __main__ (app.py) and run its startup code
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=pdf_pool_context())
+        return _pool
+
+
+def iter_pdf_pages(source, start=0, stop=None):
+    doc = _open_pdf(source)
+    try:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for page_no in range(start, stop):
+            yield doc[page_no].get_text()
+    finally:
+        doc.close()
+
+
+def _extract_page_range(source, start, stop):
+    return list(iter_pdf_pages(source, start, stop))
+
+
+@timed("pdf.extract")
+def extract_pages_from_pdf(source, workers=PDF_WORKERS):
+    # workers: how many pool processes may work on this document at once,
+    # capped at the shared pool's PDF_WORKERS; 1 extracts inline
+    workers = min(workers, PDF_WORKERS)
+    doc = _open_pdf(source)
+    page_count = doc.page_count
+    if page_count < PDF_PARALLEL_MIN_PAGES or workers <= 1:
+        try:
+            return [page.get_text() for page in doc]
+        finally:
+            doc.close()
+    doc.close()
+
+    if isinstance(source, (bytearray, memoryview)):
+        source = bytes(source)
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    pool = _get_pool()
+    futures = [pool.submit(_extract_page_range, source, start, stop) for start, stop in ranges]
+    return [text for future in futures for text in future.result()]
+
+
+def extract_text_from_pdf(source):
+    return "".join(extract_pages_from_pdf(source))
+
+
+def _extract_text(source):
+    return "".join(iter_pdf_pages(source))
+
+
+def submit_text_extraction(source):
+    # Whole-document extraction on the shared process pool, for callers that
+    # extract many PDFs at once and want them in parallel across documents
+    if isinstance(source, (bytearray, memoryview)):
+        source = bytes(source)
+    return _get_pool().submit(_extract_text, source)
+
+
+def _token_spans(text, tokenizer=None):
+    # Character spans of each token; fast (Rust) tokenizers give exact offsets,
+    # anything else falls back to whitespace words.
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        encoding = tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )
+        return [span for span in encoding["offset_mapping"] if span[1] > span[0]]
+    return [m.span() for m in _WORD_RE.finditer(text)]
+
+
+def chunk_pages(pages, tokenizer=None, chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be positive")
+    if not 0 <= overlap < chunk_tokens:
+        raise ValueError("overlap must be between 0 and chunk_tokens - 1")
+
+    page_starts = []
+    position = 0
+    for page in pages:
+        page_starts.append(position)
+        position += len(page)
+    text = "".join(pages)
+
+    spans = _token_spans(text, tokenizer)
+    if not spans:
+        return []
+
+    chunks = []
+    step = chunk_tokens - overlap
+    for start in range(0, len(spans), step):
+        window = spans[start:start + chunk_tokens]
+        char_start, char_end = window[0][0], window[-1][1]
+        chunk_text = text[char_start:char_end].strip()
+        if chunk_text:
+            chunks.append({
+                "text": chunk_text,
+                "char_start": char_start,
+                "char_end": char_end,
+                "page_start": bisect_right(page_starts, char_start),
+                "page_end": bisect_right(page_starts, char_end - 1),
+                "tokens": len(window),
+            })
+        if start + chunk_tokens >= len(spans):
+            break
+    return chunks